@@ -0,0 +1,105 @@
+"""Rebuild the FAISS index as flat / IVF-Flat / IVF-PQ / HNSW, optionally with a recall-vs-latency report.
+
+    python -m app.cli.build_index --type ivf_pq --report
+    python -m app.cli.build_index --type hnsw --report --no-write   # evaluate only
+
+Vectors are read back from the current index, so rebuilding from an IVF-PQ index is lossy; rebuild
+from a flat index (or re-embed) when switching away from PQ. The API may keep running: if it commits
+to the index during the build, publishing is refused instead of dropping its new vectors, and after
+a successful publish the API reloads the new manifest on its next write (or POST /api/index/reload).
+"""
+import argparse
+import logging
+from time import perf_counter
+
+import faiss
+import numpy as np
+
+from ..config import get_settings
+from ..vector_store.faiss_store import INDEX_TYPES, FaissStore, ManifestConflictError, build_index
+
+logger = logging.getLogger(__name__)
+
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256, 512)
+
+
+def _time_queries(index: faiss.Index, queries: np.ndarray, k: int, params=None):
+    """Search one query at a time, as the API does; return (labels, ms per query)."""
+    labels = np.empty((len(queries), k), dtype="int64")
+    start = perf_counter()
+    for i, q in enumerate(queries):
+        labels[i] = index.search(q[None, :], k, params=params)[1][0]
+    return labels, (perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_report(index: faiss.Index, ids: np.ndarray, vectors: np.ndarray, k: int, n_queries: int) -> None:
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    # Perturb sampled vectors so queries are near, not identical to, stored points.
+    queries = vectors[picked] + rng.normal(scale=0.01 * float(vectors.std()), size=vectors[picked].shape)
+    queries = queries.astype("float32")
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    truth_pos, flat_ms = _time_queries(flat, queries, k)
+    truth = ids[truth_pos]
+
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVF):
+        sweep = [("nprobe", n, faiss.SearchParametersIVF(nprobe=n)) for n in NPROBE_SWEEP if n <= inner.nlist]
+    elif isinstance(inner, faiss.IndexHNSW):
+        sweep = [("efSearch", ef, faiss.SearchParametersHNSW(efSearch=ef)) for ef in EF_SEARCH_SWEEP]
+    else:
+        sweep = [("-", "-", None)]
+
+    print(f"\n{len(queries)} queries, k={k}, {len(vectors)} vectors, flat baseline {flat_ms:.3f} ms/query")
+    print(f"{'param':>10} {'value':>6} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    for name, value, params in sweep:
+        labels, ms = _time_queries(index, queries, k, params)
+        recall = np.mean([len(set(labels[i]) & set(truth[i])) / k for i in range(len(queries))])
+        print(f"{name:>10} {value:>6} {recall:>9.3f} {ms:>9.3f} {flat_ms / ms:>7.1f}x")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=settings.faiss_index_path)
+    parser.add_argument("--type", choices=INDEX_TYPES, default=settings.faiss_index_type)
+    parser.add_argument("--report", action="store_true", help="print recall@k and latency against a flat baseline")
+    parser.add_argument("--no-write", action="store_true", help="build and report without replacing the index")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    store = FaissStore.open(args.index)
+    if store is None:
+        raise SystemExit(f"No index at {args.index}; ingest some documents first.")
+    ids, vectors = store.export()
+    logger.info("Building %s index over %d vectors (dim=%d)", args.type, len(ids), store.dim)
+    start = perf_counter()
+    index = build_index(vectors, ids, args.type)
+    logger.info("Built in %.1fs", perf_counter() - start)
+
+    if args.report:
+        recall_report(index, ids, vectors, args.k, args.queries)
+
+    if not args.no_write:
+        try:
+            store.replace_all(index)
+        except ManifestConflictError:
+            raise SystemExit(
+                "The index was changed by another writer (e.g. the API ingested documents) while "
+                "rebuilding; publishing would lose those vectors. Rerun the build."
+            )
+        store.collect_garbage()
+        logger.info(
+            "Published manifest v%d for %s; POST /api/index/reload (or restart the API) to serve it.",
+            store.version,
+            args.index,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Bulk-ingest a directory tree or .zip archive of PDF/DOCX files.
+
+    python -m app.cli.bulk_ingest /arsip/laporan-audit --workers 8 --source-unit SPI --year 2023
+
+Files are deduplicated by SHA-256 (against the database and within the run), parsed and chunked
+in a process pool, embedded in batches that span files, and committed by the index writer with
+multi-row inserts (one transaction and one FAISS segment per batch). Finished files are appended
+to a checkpoint so an interrupted run resumes where it stopped. Stop the API first: both processes
+publish the FAISS manifest.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..db import database, documents, init_db
+from ..services.http_pool import close_http_client
+from ..services.index_writer import index_writer
+from ..services.ingest_service import _hash_file, doc_type_for, embedding_client, parse_file, stored_name_for
+from ..vector_store.index_manager import index_manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SUPPORTED = {".pdf", ".docx"}
+
+
+@dataclass
+class _Parsed:
+    key: str
+    path: Path
+    file_hash: str
+    rows: list
+
+
+@dataclass
+class _Stats:
+    documents: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    started: float = field(default_factory=perf_counter)
+
+    def summary(self) -> str:
+        elapsed = perf_counter() - self.started
+        return (
+            f"{self.documents} documents, {self.chunks} chunks, {self.duplicates} duplicates, "
+            f"{self.failed} failed in {elapsed:.1f}s "
+            f"({self.documents / elapsed:.2f} docs/s, {self.chunks / elapsed:.1f} chunks/s)"
+        )
+
+
+def _iter_sources(source: Path, scratch: Path) -> Iterator[tuple[str, Path, bool]]:
+    """Yield (checkpoint key, path, is_temporary); zip members are extracted to `scratch` one by one."""
+    if source.is_dir():
+        for path in sorted(source.rglob("*")):
+            if path.is_file() and path.suffix.lower() in SUPPORTED:
+                yield str(path.relative_to(source)), path, False
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                name = Path(info.filename)
+                if info.is_dir() or name.suffix.lower() not in SUPPORTED:
+                    continue
+                target = scratch / f"{uuid4().hex}_{name.name}"
+                with zf.open(info) as src, target.open("wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                yield info.filename, target, True
+    else:
+        raise SystemExit(f"{source} is neither a directory nor a zip archive.")
+
+
+class BulkIngester:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.checkpoint = Path(args.checkpoint)
+        self.tags: Optional[dict] = json.loads(args.tags) if args.tags else None
+        self.stats = _Stats()
+        self._batch: List[_Parsed] = []
+        self._temporary: set[Path] = set()
+
+    def _load_checkpoint(self) -> set[str]:
+        if not self.checkpoint.exists():
+            return set()
+        return {line for line in self.checkpoint.read_text(encoding="utf-8").splitlines() if line}
+
+    def _mark_done(self, keys: List[str]) -> None:
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        with self.checkpoint.open("a", encoding="utf-8") as f:
+            f.writelines(f"{key}\n" for key in keys)
+
+    async def run(self) -> None:
+        done = self._load_checkpoint()
+        known = {row[0] for row in await database.fetch_all(select(documents.c.file_hash))}
+        loop = asyncio.get_running_loop()
+        in_flight: deque = deque()
+
+        with ProcessPoolExecutor(self.args.workers) as pool, tempfile.TemporaryDirectory() as scratch:
+            for key, path, temporary in _iter_sources(Path(self.args.source), Path(scratch)):
+                if temporary:
+                    self._temporary.add(path)
+                if key in done:
+                    self._discard(path)
+                    continue
+                file_hash = await asyncio.to_thread(_hash_file, path)
+                if file_hash in known:
+                    self.stats.duplicates += 1
+                    self._mark_done([key])
+                    self._discard(path)
+                    continue
+                known.add(file_hash)
+                in_flight.append((key, path, file_hash, loop.run_in_executor(pool, parse_file, path)))
+                # Keep the pool busy without reading the whole archive ahead.
+                while len(in_flight) >= self.args.workers * 2:
+                    await self._collect(in_flight.popleft())
+            while in_flight:
+                await self._collect(in_flight.popleft())
+            await self._flush()
+
+        logger.info("Bulk ingest finished: %s", self.stats.summary())
+
+    def _discard(self, path: Path) -> None:
+        if path in self._temporary:
+            path.unlink(missing_ok=True)
+            self._temporary.discard(path)
+
+    async def _collect(self, item) -> None:
+        key, path, file_hash, future = item
+        try:
+            rows = await future
+        except Exception as exc:
+            self.stats.failed += 1
+            logger.warning("Failed to parse %s: %s", key, exc)
+            self._discard(path)
+            return
+        self._batch.append(_Parsed(key, path, file_hash, rows))
+        if sum(len(p.rows) for p in self._batch) >= self.args.batch_chunks:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        texts = [row["text"] for parsed in batch for row in parsed.rows]
+        embeddings = await embedding_client.aembed(texts, strict=True)
+
+        upload_dir = Path(settings.upload_dir)
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        submits = []
+        offset = 0
+        for parsed in batch:
+            # Display name only: a tree or archive may repeat basenames, the stored name cannot.
+            filename = Path(parsed.key).name
+            stored_name = stored_name_for(parsed.file_hash, filename)
+            await asyncio.to_thread(shutil.copyfile, parsed.path, upload_dir / stored_name)
+            document = {
+                "filename": filename,
+                "file_hash": parsed.file_hash,
+                "stored_name": stored_name,
+                "type": doc_type_for(parsed.path),
+                "source_unit": self.args.source_unit,
+                "year": self.args.year,
+                "tags": self.tags,
+            }
+            doc_embeddings = embeddings[offset : offset + len(parsed.rows)]
+            offset += len(parsed.rows)
+            submits.append(index_writer.submit(document, parsed.rows, doc_embeddings))
+            self._discard(parsed.path)
+        # Submitted together, the writer commits the whole batch as one transaction and segment.
+        await asyncio.gather(*submits)
+
+        self._mark_done([parsed.key for parsed in batch])
+        self.stats.documents += len(batch)
+        self.stats.chunks += len(texts)
+        logger.info("Committed %d documents (%s)", len(batch), self.stats.summary())
+
+
+async def _main(args: argparse.Namespace) -> None:
+    init_db()
+    await database.connect()
+    await asyncio.to_thread(index_manager.load)
+    await index_writer.start()
+    try:
+        await BulkIngester(args).run()
+    finally:
+        await index_writer.stop()
+        await close_http_client()
+        await database.disconnect()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory or .zip archive")
+    parser.add_argument("--workers", type=int, default=4, help="parser processes")
+    parser.add_argument("--batch-chunks", type=int, default=512, help="chunks per embedding/commit batch")
+    parser.add_argument("--checkpoint", default="../data/bulk_ingest.checkpoint")
+    parser.add_argument("--source-unit")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--tags", help="JSON object applied to every document")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
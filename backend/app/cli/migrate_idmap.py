@@ -0,0 +1,65 @@
+"""Rewrite a positional FAISS index + embeddings_index_map into an IndexIDMap2 keyed by chunk id.
+
+Stop the API before running:
+
+    python -m app.cli.migrate_idmap [--index ../data/faiss/index.bin]
+"""
+import argparse
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import faiss
+import numpy as np
+from sqlalchemy import select, update
+
+from ..config import get_settings
+from ..db import get_engine, embeddings_index_map
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(index_path: Path) -> None:
+    index = faiss.read_index(str(index_path))
+    if hasattr(index, "id_map"):
+        logger.info("%s already uses chunk ids, nothing to do.", index_path)
+        return
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        rows = conn.execute(select(embeddings_index_map.c.chunk_id, embeddings_index_map.c.faiss_vector_id)).all()
+        positions = np.array([r.faiss_vector_id for r in rows], dtype="int64")
+        chunk_ids = np.array([r.chunk_id for r in rows], dtype="int64")
+        valid = (positions >= 0) & (positions < index.ntotal)
+        if not valid.all():
+            logger.warning("Skipping %d map rows pointing past the index (ntotal=%d).", (~valid).sum(), index.ntotal)
+
+        vectors = index.reconstruct_n(0, index.ntotal)
+        migrated = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+        migrated.add_with_ids(vectors[positions[valid]], chunk_ids[valid])
+        logger.info("Dropping %d vectors without a map row.", index.ntotal - migrated.ntotal)
+
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        faiss.write_index(migrated, str(tmp_path))
+
+        # Two passes so the unique constraint never sees a transient collision.
+        conn.execute(update(embeddings_index_map).values(faiss_vector_id=-embeddings_index_map.c.chunk_id))
+        conn.execute(update(embeddings_index_map).values(faiss_vector_id=embeddings_index_map.c.chunk_id))
+
+        shutil.copy2(index_path, index_path.with_name(index_path.name + ".bak"))
+        os.replace(tmp_path, index_path)
+
+    logger.info("Migrated %d vectors in %s (backup: %s.bak).", migrated.ntotal, index_path, index_path.name)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=get_settings().faiss_index_path)
+    args = parser.parse_args()
+    migrate(Path(args.index))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Re-embed every chunk with the configured embedding model and swap in a freshly built index.
+
+    python -m app.cli.reembed --type hnsw
+    python -m app.cli.reembed --restart      # discard a previous partial run
+
+Chunks are streamed from SQLite in id order, one page at a time, embedded in batches and appended
+to a staging index next to the live one (<index dir>/<stem>.rebuild/). Its manifest doubles as the
+checkpoint, so an interrupted run resumes after the last chunk id it holds. Once every chunk is
+embedded, vectors of chunks deleted in the meantime are dropped. The final index is then built with
+the requested type and published with one atomic manifest replace that records the embedding model
+and dimension, which retrieval validates. The publish takes the index's cross-process writer lock.
+A running API keeps serving the old index until `POST /api/index/reload` or a restart. Its next
+index write notices the newer manifest and reloads it before writing, instead of overwriting it.
+Pause ingest while the job finishes, because documents committed after the last pass are not in
+the new index.
+"""
+import argparse
+import asyncio
+import logging
+import shutil
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from ..config import get_settings
+from ..db import database, chunks, init_db
+from ..services.embedding_client import EmbeddingClient, EmbeddingFallbackError
+from ..services.http_pool import close_http_client
+from ..vector_store.faiss_store import INDEX_TYPES, FaissStore, build_index, index_lock
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _staging_path(index_path: Path) -> Path:
+    return index_path.parent / f"{index_path.stem}.rebuild" / index_path.name
+
+
+def _open_staging(path: Path, model: str, restart: bool) -> Optional[FaissStore]:
+    if restart:
+        shutil.rmtree(path.parent, ignore_errors=True)
+        return None
+    store = FaissStore.open(str(path))
+    if store is not None:
+        store.remove_orphans()  # segments of a page interrupted before its commit
+    if store is not None and store.model != model:
+        logger.info("Staging index was built with %s, not %s; starting over.", store.model, model)
+        shutil.rmtree(path.parent, ignore_errors=True)
+        return None
+    return store
+
+
+async def _embed_all(staging: Optional[FaissStore], path: Path, client: EmbeddingClient, page_size: int) -> FaissStore:
+    """Append vectors for every chunk past the staging checkpoint; returns the staging store."""
+    model = client.model_id
+    last_id = int(max((s.ids().max() for s in staging.segments if s.ntotal), default=0)) if staging else 0
+    total = await database.fetch_val(select(func.count()).select_from(chunks))
+    done = await database.fetch_val(select(func.count()).select_from(chunks).where(chunks.c.id <= last_id))
+    if done:
+        logger.info("Resuming after chunk id %d (%d/%d chunks already embedded)", last_id, done, total)
+    started, embedded = perf_counter(), 0
+    while True:
+        rows = await database.fetch_all(
+            select(chunks.c.id, chunks.c.text).where(chunks.c.id > last_id).order_by(chunks.c.id).limit(page_size)
+        )
+        if not rows:
+            return staging
+        try:
+            vectors = await client.aembed([row["text"] for row in rows], strict=True)
+        except EmbeddingFallbackError as exc:
+            raise SystemExit(f"{exc} Fix the provider and rerun; embedded pages are kept.")
+        ids = [row["id"] for row in rows]
+        if staging is None:
+            staging = FaissStore(str(path), dim=len(vectors[0]), model=model)
+        # Each page is one segment plus a manifest commit, which is also the resume point.
+        await asyncio.to_thread(staging.add, vectors, ids)
+        last_id = ids[-1]
+        done += len(ids)
+        embedded += len(ids)
+        rate = embedded / max(perf_counter() - started, 1e-9)
+        logger.info("%d/%d chunks embedded (%.0f chunks/s)", done, total, rate)
+
+
+async def _live_chunk_ids() -> np.ndarray:
+    rows = await database.fetch_all(select(chunks.c.id))
+    return np.fromiter((row[0] for row in rows), dtype="int64", count=len(rows))
+
+
+async def _main(args: argparse.Namespace) -> None:
+    init_db()
+    await database.connect()
+    try:
+        client = EmbeddingClient()
+        index_path = Path(args.index)
+        path = _staging_path(index_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = _open_staging(path, client.model_id, args.restart)
+        staging = await _embed_all(staging, path, client, args.page_size)
+        if staging is None:
+            raise SystemExit("No chunks to embed.")
+
+        ids, vectors = await asyncio.to_thread(staging.export)
+        keep = np.isin(ids, await _live_chunk_ids())
+        if not keep.all():
+            logger.info("Dropping %d vectors of chunks deleted during the rebuild", int((~keep).sum()))
+        ids, vectors = ids[keep], vectors[keep]
+        logger.info("Building %s index over %d vectors (dim=%d)", args.type, len(ids), staging.dim)
+        start = perf_counter()
+        index = await asyncio.to_thread(build_index, vectors, ids, args.type)
+        logger.info("Built in %.1fs", perf_counter() - start)
+
+        with index_lock(index_path):
+            live = FaissStore.open(str(index_path)) or FaissStore(str(index_path), dim=staging.dim)
+            live.replace_all(index, model=client.model_id)
+            live.collect_garbage()
+        shutil.rmtree(path.parent, ignore_errors=True)
+        logger.info(
+            "Published manifest v%d for %s (%s, %d-d); POST /api/index/reload (or restart the API) to serve it.",
+            live.version,
+            index_path,
+            live.model,
+            live.dim,
+        )
+    finally:
+        await close_http_client()
+        await database.disconnect()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=settings.faiss_index_path)
+    parser.add_argument("--type", choices=INDEX_TYPES, default=settings.faiss_index_type)
+    parser.add_argument("--page-size", type=int, default=2048, help="chunks read, embedded and checkpointed per step")
+    parser.add_argument("--restart", action="store_true", help="discard a previous partial run")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,49 @@ class Settings(BaseSettings):
     llm_api_key: str = os.getenv("LLM_API_KEY", "")
     embed_provider: str = os.getenv("EMBED_PROVIDER", "gemini")
     embed_api_key: str = os.getenv("EMBED_API_KEY", "")
+    embed_batch_size: int = int(os.getenv("EMBED_BATCH_SIZE", 64))
+    embed_batch_tokens: int = int(os.getenv("EMBED_BATCH_TOKENS", 20000))
+    embed_concurrency: int = int(os.getenv("EMBED_CONCURRENCY", 4))
+    embed_local_batch_size: int = int(os.getenv("EMBED_LOCAL_BATCH_SIZE", 32))
+    embed_cache_enabled: bool = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    embed_cache_path: str = os.getenv("EMBED_CACHE_PATH", "../data/cache/embeddings.db")
+    embed_cache_max_mb: int = int(os.getenv("EMBED_CACHE_MAX_MB", 1024))
+    embed_cache_float16: bool = os.getenv("EMBED_CACHE_FLOAT16", "false").lower() == "true"
     sqlite_path: str = os.getenv("SQLITE_PATH", "../data/sqlite/app.db")
     faiss_index_path: str = os.getenv("FAISS_INDEX_PATH", "../data/faiss/index.bin")
     upload_dir: str = os.getenv("UPLOAD_DIR", "../data/uploads")
     chunk_size: int = int(os.getenv("CHUNK_SIZE", 900))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", 120))
+    chunk_respect_boundaries: bool = os.getenv("CHUNK_RESPECT_BOUNDARIES", "true").lower() == "true"
     max_retrieve: int = int(os.getenv("MAX_RETRIEVE", 5))
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "hybrid")  # vector | lexical | hybrid
+    hybrid_lexical_weight: float = float(os.getenv("HYBRID_LEXICAL_WEIGHT", 0.5))
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", 50))
+    rrf_k: int = int(os.getenv("RRF_K", 60))
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", 20))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", 16))
+    rerank_budget_ms: int = int(os.getenv("RERANK_BUDGET_MS", 300))
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    answer_cache_threshold: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+    answer_cache_ttl: int = int(os.getenv("ANSWER_CACHE_TTL", 3600))
+    answer_cache_max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    http_max_keepalive: int = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", 2))
+    parse_workers: int = int(os.getenv("PARSE_WORKERS", 2))  # processes extracting/chunking uploads
+    parse_pages_per_task: int = int(os.getenv("PARSE_PAGES_PER_TASK", 16))
+    faiss_index_type: str = os.getenv("FAISS_INDEX_TYPE", "flat")  # flat | ivf_flat | ivf_pq | hnsw
+    faiss_nlist: int = int(os.getenv("FAISS_NLIST", 0))  # 0 = 4*sqrt(n) at build time
+    faiss_pq_m: int = int(os.getenv("FAISS_PQ_M", 48))
+    faiss_hnsw_m: int = int(os.getenv("FAISS_HNSW_M", 32))
+    faiss_nprobe: int = int(os.getenv("FAISS_NPROBE", 16))
+    faiss_ef_search: int = int(os.getenv("FAISS_EF_SEARCH", 64))
+    faiss_max_segments: int = int(os.getenv("FAISS_MAX_SEGMENTS", 8))
+    faiss_merge_ratio: float = float(os.getenv("FAISS_MERGE_RATIO", 0.2))
+    faiss_compact_ratio: float = float(os.getenv("FAISS_COMPACT_RATIO", 0.1))
 
     class Config:
         env_file = ".env"
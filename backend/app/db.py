@@ -2,7 +2,7 @@ from datetime import datetime
 from pathlib import Path
 import sqlalchemy
 from sqlalchemy import Table, Column, Integer, String, DateTime, ForeignKey, JSON, Text
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from databases import Database
 from .config import get_settings
 
@@ -21,10 +21,11 @@ documents = Table(
     Column("id", Integer, primary_key=True),
     Column("filename", String, nullable=False),
     Column("file_hash", String, unique=True, nullable=False),
-    Column("type", String, nullable=False),
-    Column("uploaded_at", DateTime, default=datetime.utcnow),
-    Column("source_unit", String),
-    Column("year", Integer),
+    Column("stored_name", String),  # original under upload_dir; NULL for documents ingested before
+    Column("type", String, nullable=False, index=True),
+    Column("uploaded_at", DateTime, server_default=func.now()),  # see ingest_jobs on `databases` defaults
+    Column("source_unit", String, index=True),
+    Column("year", Integer, index=True),
     Column("tags", JSON),
 )
 
@@ -32,7 +33,7 @@ chunks = Table(
     "chunks",
     metadata,
     Column("id", Integer, primary_key=True),
-    Column("document_id", Integer, ForeignKey("documents.id"), nullable=False),
+    Column("document_id", Integer, ForeignKey("documents.id"), nullable=False, index=True),
     Column("chunk_index", Integer, nullable=False),
     Column("text", Text, nullable=False),
     Column("page_start", Integer),
@@ -44,7 +45,30 @@ embeddings_index_map = Table(
     "embeddings_index_map",
     metadata,
     Column("chunk_id", Integer, ForeignKey("chunks.id"), primary_key=True),
-    Column("faiss_vector_id", Integer, nullable=False, unique=True),
+    Column("faiss_vector_id", Integer, nullable=False, unique=True, index=True),
+)
+
+ingest_jobs = Table(
+    "ingest_jobs",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("status", String, nullable=False, default="queued"),  # queued | running | done | failed
+    Column("filename", String, nullable=False),
+    Column("file_path", String, nullable=False),
+    Column("file_hash", String),
+    Column("source_unit", String),
+    Column("year", Integer),
+    Column("tags", JSON),
+    Column("document_id", Integer, ForeignKey("documents.id")),
+    Column("replaces_document_id", Integer),  # set for uploads replacing an existing document
+    # `databases` skips Python-side defaults, so job columns read back by the API default in SQL
+    Column("pages_parsed", Integer, nullable=False, server_default=text("0")),
+    Column("chunks_total", Integer, nullable=False, server_default=text("0")),
+    Column("chunks_embedded", Integer, nullable=False, server_default=text("0")),
+    Column("timings", JSON),  # seconds per ingest stage, set when the job finishes
+    Column("error", Text),
+    Column("created_at", DateTime, nullable=False, server_default=func.now()),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now()),
 )
 
 chat_sessions = Table(
@@ -75,6 +99,64 @@ audit_logs = Table(
 )
 
 
+# External-content FTS5 index over chunks.text (rowid = chunks.id), kept in sync by triggers so
+# every chunk insert/delete in the ingest transaction updates the lexical index with it.
+CHUNKS_FTS_DDL = [
+    """CREATE VIRTUAL TABLE chunks_fts USING fts5(
+        text, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS chunks_fts_ai AFTER INSERT ON chunks BEGIN
+        INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN
+        INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE OF text ON chunks BEGIN
+        INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+
+def _init_chunks_fts(engine) -> None:
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+        ).first()
+        if exists:
+            return
+        for ddl in CHUNKS_FTS_DDL:
+            conn.exec_driver_sql(ddl)
+        # Index chunks ingested before the FTS table existed.
+        conn.exec_driver_sql("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+
+
+def _add_missing_columns(engine) -> None:
+    """create_all never alters existing tables; add nullable columns introduced later."""
+    inspector = sqlalchemy.inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing and col.nullable and not col.primary_key:
+                    col_type = col.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" {col_type}')
+
+
+def _backfill_ingest_jobs(engine) -> None:
+    """Jobs and documents written before the SQL defaults existed may hold NULL counters/timestamps."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "UPDATE ingest_jobs SET pages_parsed = COALESCE(pages_parsed, 0), "
+            "chunks_total = COALESCE(chunks_total, 0), chunks_embedded = COALESCE(chunks_embedded, 0), "
+            "created_at = COALESCE(created_at, CURRENT_TIMESTAMP), "
+            "updated_at = COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) "
+            "WHERE pages_parsed IS NULL OR chunks_total IS NULL OR chunks_embedded IS NULL "
+            "OR created_at IS NULL OR updated_at IS NULL"
+        )
+        conn.exec_driver_sql("UPDATE documents SET uploaded_at = CURRENT_TIMESTAMP WHERE uploaded_at IS NULL")
+
+
 def get_engine():
     return sqlalchemy.create_engine(DATABASE_URL)
 
@@ -82,4 +164,11 @@ def get_engine():
 def init_db():
     engine = get_engine()
     metadata.create_all(engine)
+    _add_missing_columns(engine)
+    # create_all skips tables that already exist, so indexes added later are created explicitly
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    _init_chunks_fts(engine)
+    _backfill_ingest_jobs(engine)
 
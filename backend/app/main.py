@@ -6,7 +6,14 @@ from starlette.responses import JSONResponse
 
 from .config import get_settings
 from .db import database, init_db
-from .routers import ingest, documents, retrieval, chat, agent
+from .vector_store.faiss_store import IndexMismatchError
+from .vector_store.index_manager import index_manager
+from .services.index_writer import index_writer
+from .services.ingest_jobs import ingest_queue
+from .services.ingest_service import shutdown_parse_pool
+from .services.http_pool import close_http_client
+from .services.reranker import reranker
+from .routers import ingest, documents, retrieval, chat, agent, metrics, vector_index
 
 logging.basicConfig(level=logging.INFO)
 settings = get_settings()
@@ -26,10 +33,19 @@ app.add_middleware(
 async def startup():
     init_db()
     await database.connect()
+    await asyncio.to_thread(index_manager.load)
+    await index_writer.start()
+    await ingest_queue.start()
+    if settings.rerank_enabled:
+        reranker.start_loading()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await ingest_queue.stop()
+    shutdown_parse_pool()
+    await index_writer.stop()
+    await close_http_client()
     await database.disconnect()
 
 
@@ -43,6 +59,13 @@ app.include_router(documents.router)
 app.include_router(retrieval.router)
 app.include_router(chat.router)
 app.include_router(agent.router)
+app.include_router(metrics.router)
+app.include_router(vector_index.router)
+
+
+@app.exception_handler(IndexMismatchError)
+async def index_mismatch_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 
 @app.exception_handler(Exception)
@@ -1,3 +1,3 @@
-from . import ingest, documents, retrieval, chat, agent
+from . import ingest, documents, retrieval, chat, agent, metrics, vector_index
 
-__all__ = ["ingest", "documents", "retrieval", "chat", "agent"]
+__all__ = ["ingest", "documents", "retrieval", "chat", "agent", "metrics", "vector_index"]
@@ -1,5 +1,5 @@
-from fastapi import APIRouter
-from ..schemas import AgentRequest, AgentResponse
+from fastapi import APIRouter, HTTPException
+from ..schemas import AgentRequest, AgentResponse, RetrievalFilter
 from ..services.agent_service import run_agent
 
 router = APIRouter(prefix="/api", tags=["agent"])
@@ -7,4 +7,8 @@ router = APIRouter(prefix="/api", tags=["agent"])
 
 @router.post("/agent/run", response_model=AgentResponse)
 async def agent_endpoint(payload: AgentRequest):
-    return await run_agent(payload)
+    try:
+        filters = RetrievalFilter.model_validate(payload.payload["filters"]) if payload.payload.get("filters") else None
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid filter: {exc}")
+    return await run_agent(payload, filters=filters)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
+from starlette.responses import StreamingResponse
+
 from ..schemas import ChatRequest, ChatResponse
-from ..services.chat_service import handle_chat
+from ..services.chat_service import handle_chat, stream_chat
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
@@ -8,3 +10,13 @@ router = APIRouter(prefix="/api", tags=["chat"])
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(payload: ChatRequest):
     return await handle_chat(payload)
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(payload: ChatRequest):
+    events = await stream_chat(payload)  # retrieval errors surface here, before the 200 is sent
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,13 +1,59 @@
+import json
+
 from sqlalchemy import select
-from fastapi import APIRouter
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette import status
 
 from ..db import database, documents
 from ..schemas import DocumentOut
+from ..services.index_writer import index_writer
+from ..services.ingest_service import discard_original
+from .ingest import accept_upload
 
 router = APIRouter(prefix="/api", tags=["documents"])
 
 
+async def _get_document(document_id: int):
+    row = await database.fetch_one(select(documents).where(documents.c.id == document_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    return row
+
+
 @router.get("/documents", response_model=list[DocumentOut])
 async def list_documents():
     rows = await database.fetch_all(select(documents))
     return [DocumentOut(**row) for row in rows]
+
+
+@router.delete("/documents/{document_id}")
+async def delete_document(document_id: int):
+    """Remove the document, its chunks and map rows; its vectors are tombstoned immediately."""
+    row = await _get_document(document_id)
+    if not await index_writer.delete(document_id):
+        raise HTTPException(status_code=404, detail="Document not found.")
+    await discard_original(row)
+    return {"document_id": document_id, "deleted": True}
+
+
+@router.put("/documents/{document_id}", status_code=status.HTTP_202_ACCEPTED)
+async def replace_document(
+    document_id: int,
+    file: UploadFile = File(...),
+    source_unit: str | None = Form(None),
+    year: int | None = Form(None),
+    tags: str | None = Form(None),
+):
+    """Ingest a new version; the old document is deleted in the same commit the new one lands in.
+
+    Metadata fields that are omitted are carried over from the document being replaced. A file
+    identical to another document is rejected with 409.
+    """
+    row = await _get_document(document_id)
+    return await accept_upload(
+        file,
+        source_unit=source_unit if source_unit is not None else row["source_unit"],
+        year=year if year is not None else row["year"],
+        tags=json.loads(tags) if tags else row["tags"],
+        replaces_document_id=document_id,
+    )
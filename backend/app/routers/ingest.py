@@ -1,42 +1,91 @@
+import hashlib
 from pathlib import Path
+from uuid import uuid4
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from sqlalchemy import select
 from starlette import status
 import json
 
 from ..config import get_settings
-from ..services.ingest_service import ingest_file
-from ..db import database
+from ..db import database, ingest_jobs
+from ..schemas import IngestJobOut
+from ..services.ingest_jobs import ingest_queue
+from ..services.ingest_service import find_duplicate
 
 router = APIRouter(prefix="/api", tags=["ingest"])
 settings = get_settings()
 
+_UPLOAD_BLOCK = 1024 * 1024
 
-@router.post("/ingest", status_code=status.HTTP_201_CREATED)
+
+async def _spool_upload(file: UploadFile, dest: Path) -> str:
+    """Stream the upload to `dest` block by block and return its SHA-256."""
+    h = hashlib.sha256()
+    with dest.open("wb") as out:
+        while block := await file.read(_UPLOAD_BLOCK):
+            h.update(block)
+            out.write(block)
+    return h.hexdigest()
+
+
+async def accept_upload(
+    file: UploadFile,
+    source_unit: str | None,
+    year: int | None,
+    tags: dict | None,
+    replaces_document_id: int | None = None,
+) -> dict:
+    """Spool an upload and queue its ingest job (or record it as a duplicate)."""
+    if file.content_type not in {"application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}:
+        raise HTTPException(status_code=400, detail="Only PDF and DOCX are supported.")
+
+    # Spooled until the job commits; the worker then moves it into upload_dir.
+    tmp_path = Path(settings.upload_dir) / "tmp" / f"{uuid4().hex}_{file.filename}"
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        file_hash = await _spool_upload(file, tmp_path)
+    except BaseException:  # includes cancellation when the client disconnects mid-upload
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    existing = await find_duplicate(file_hash)
+    if existing and replaces_document_id is not None and existing != replaces_document_id:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=409,
+            detail=f"File is identical to document {existing}; delete that one or upload a different file.",
+        )
+    if existing:
+        tmp_path.unlink(missing_ok=True)
+        job_id = await ingest_queue.record_duplicate(file.filename, file_hash, existing)
+        return {"job_id": job_id, "status": "done", "document_id": existing}
+
+    job_id = await ingest_queue.enqueue(
+        tmp_path,
+        filename=file.filename,
+        source_unit=source_unit,
+        year=year,
+        tags=tags,
+        file_hash=file_hash,
+        replaces_document_id=replaces_document_id,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.post("/ingest", status_code=status.HTTP_202_ACCEPTED)
 async def ingest_endpoint(
     file: UploadFile = File(...),
     source_unit: str | None = Form(None),
     year: int | None = Form(None),
     tags: str | None = Form(None),
 ):
-    if file.content_type not in {"application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}:
-        raise HTTPException(status_code=400, detail="Only PDF and DOCX are supported.")
+    parsed_tags = json.loads(tags) if tags else None
+    return await accept_upload(file, source_unit, year, parsed_tags)
 
-    tmp_path = Path(settings.upload_dir) / f"tmp_{file.filename}"
-    tmp_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path.write_bytes(await file.read())
-
-    try:
-        parsed_tags = json.loads(tags) if tags else None
-        doc_id = await ingest_file(
-            tmp_path,
-            filename=file.filename,
-            source_unit=source_unit,
-            year=year,
-            tags=parsed_tags,
-            faiss_index_path=settings.faiss_index_path,
-        )
-    finally:
-        if tmp_path.exists():
-            tmp_path.unlink()
 
-    return {"document_id": doc_id}
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobOut)
+async def ingest_job_status(job_id: int):
+    row = await database.fetch_one(select(ingest_jobs).where(ingest_jobs.c.id == job_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found.")
+    return IngestJobOut(**row)
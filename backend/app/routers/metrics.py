@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+
+from ..services.chat_service import answer_cache
+from ..services.embedding_cache import get_embedding_cache
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics/cache")
+async def cache_metrics():
+    embedding_cache = get_embedding_cache()
+    return {
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+    }
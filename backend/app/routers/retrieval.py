@@ -1,12 +1,56 @@
-from fastapi import APIRouter, Query
+import json
 
-from ..services.retrieval_service import retrieve
-from ..schemas import RetrievalResponse, ChunkMetadata
+from fastapi import APIRouter, HTTPException, Query
+
+from ..services.retrieval_service import retrieve, retrieve_many
+from ..schemas import (
+    RetrievalBatchRequest,
+    RetrievalBatchResponse,
+    RetrievalFilter,
+    RetrievalMode,
+    RetrievalResponse,
+    ChunkMetadata,
+)
 
 router = APIRouter(prefix="/api", tags=["retrieve"])
 
 
 @router.get("/retrieve", response_model=RetrievalResponse)
-async def retrieve_endpoint(q: str = Query(..., alias="query"), k: int = Query(5)):
-    results = await retrieve(q, k)
+async def retrieve_endpoint(
+    q: str = Query(..., alias="query"),
+    k: int = Query(5),
+    nprobe: int | None = Query(None, ge=1, description="IVF lists to probe (IVF indexes only)"),
+    ef_search: int | None = Query(None, ge=1, description="HNSW efSearch (HNSW indexes only)"),
+    mode: RetrievalMode | None = Query(None, description="vector | lexical | hybrid (default RETRIEVAL_MODE)"),
+    lexical_weight: float | None = Query(None, ge=0.0, le=1.0, description="Lexical share of hybrid fusion"),
+    source_unit: str | None = Query(None),
+    year: int | None = Query(None),
+    doc_type: str | None = Query(None, description="pdf | docx"),
+    tags: str | None = Query(None, description='JSON object matched per key, e.g. {"area": "pengadaan"}'),
+):
+    try:
+        filters = RetrievalFilter(
+            source_unit=source_unit, year=year, doc_type=doc_type, tags=json.loads(tags) if tags else None
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid filter: {exc}")
+    results = await retrieve(
+        q, k, nprobe=nprobe, ef_search=ef_search, mode=mode, lexical_weight=lexical_weight, filters=filters
+    )
     return RetrievalResponse(query=q, results=results)
+
+
+@router.post("/retrieve/batch", response_model=RetrievalBatchResponse)
+async def retrieve_batch_endpoint(payload: RetrievalBatchRequest):
+    results = await retrieve_many(
+        payload.queries,
+        payload.k,
+        nprobe=payload.nprobe,
+        ef_search=payload.ef_search,
+        mode=payload.mode,
+        lexical_weight=payload.lexical_weight,
+        filters=payload.filters,
+    )
+    return RetrievalBatchResponse(
+        results=[RetrievalResponse(query=q, results=r) for q, r in zip(payload.queries, results)]
+    )
@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi import APIRouter
+
+from ..vector_store.index_manager import index_manager
+
+router = APIRouter(prefix="/api", tags=["index"])
+
+
+def _describe() -> dict:
+    store = index_manager.store
+    if store is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "model": store.model,
+        "dim": store.dim,
+        "vectors": store.live_count,
+        "deleted": len(store.tombstones),
+        "segments": len(store.segments),
+        "manifest_version": store.version,
+    }
+
+
+@router.get("/index")
+async def index_info():
+    return _describe()
+
+
+@router.post("/index/reload")
+async def reload_index():
+    """Pick up an index swapped in on disk (e.g. by app.cli.reembed) without restarting."""
+    await asyncio.to_thread(index_manager.load)
+    return _describe()
@@ -1,7 +1,12 @@
 from .models import (
     DocumentIn,
     DocumentOut,
+    IngestJobOut,
     ChunkMetadata,
+    RetrievalBatchRequest,
+    RetrievalBatchResponse,
+    RetrievalFilter,
+    RetrievalMode,
     RetrievalResponse,
     ChatRequest,
     ChatResponse,
@@ -14,7 +19,12 @@ from .models import (
 __all__ = [
     "DocumentIn",
     "DocumentOut",
+    "IngestJobOut",
     "ChunkMetadata",
+    "RetrievalBatchRequest",
+    "RetrievalBatchResponse",
+    "RetrievalFilter",
+    "RetrievalMode",
     "RetrievalResponse",
     "ChatRequest",
     "ChatResponse",
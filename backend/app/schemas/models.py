@@ -1,6 +1,8 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field
+
+RetrievalMode = Literal["vector", "lexical", "hybrid"]
 
 
 class DocumentIn(BaseModel):
@@ -22,6 +24,21 @@ class DocumentOut(BaseModel):
         orm_mode = True
 
 
+class IngestJobOut(BaseModel):
+    id: int
+    status: str
+    filename: str
+    document_id: Optional[int]
+    replaces_document_id: Optional[int] = None
+    pages_parsed: int
+    chunks_total: int
+    chunks_embedded: int
+    timings: Optional[Dict[str, float]] = None
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+
 class ChunkMetadata(BaseModel):
     document_id: int
     filename: str
@@ -30,16 +47,43 @@ class ChunkMetadata(BaseModel):
     snippet: str
 
 
+class RetrievalFilter(BaseModel):
+    """Document metadata a chunk must match; `tags` matches each key/value exactly."""
+
+    source_unit: Optional[str] = None
+    year: Optional[int] = None
+    doc_type: Optional[Literal["pdf", "docx"]] = None
+    tags: Optional[Dict[str, Union[str, int, float, bool]]] = None
+
+
 class RetrievalResponse(BaseModel):
     query: str
     results: List[ChunkMetadata]
 
 
+class RetrievalBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=256)
+    k: int = 5
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    mode: Optional[RetrievalMode] = None
+    lexical_weight: Optional[float] = Field(None, ge=0.0, le=1.0)
+    filters: Optional[RetrievalFilter] = None
+
+
+class RetrievalBatchResponse(BaseModel):
+    results: List[RetrievalResponse]
+
+
 class ChatRequest(BaseModel):
     session_id: Optional[int] = None
     user: str
     query: str
     max_retrieve: int = 5
+    retrieval_mode: Optional[RetrievalMode] = None
+    lexical_weight: Optional[float] = Field(None, ge=0.0, le=1.0)
+    filters: Optional[RetrievalFilter] = None
+    rerank: Optional[bool] = None
 
 
 class Citation(BaseModel):
@@ -54,6 +98,7 @@ class ChatResponse(BaseModel):
     answer: str
     citations: List[Citation]
     session_id: int
+    context_tokens: int = 0
 
 
 class AgentMode(str):
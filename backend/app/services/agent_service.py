@@ -1,5 +1,6 @@
-from typing import List
-from ..schemas import AgentRequest, AgentResponse, AgentMode, Citation
+from typing import List, Optional
+from ..schemas import AgentRequest, AgentResponse, AgentMode, Citation, RetrievalFilter
+from .context_builder import pack_context
 from .retrieval_service import retrieve
 from .llm_client import LLMClient
 
@@ -20,28 +21,31 @@ TEMPLATES = {
 }
 
 
-async def run_agent(req: AgentRequest) -> AgentResponse:
+async def run_agent(req: AgentRequest, filters: Optional[RetrievalFilter] = None) -> AgentResponse:
     mode = req.mode
     instruction = TEMPLATES.get(mode, "Buat ringkasan berdasarkan konteks.")
     base_prompt = (
         "Peran: Internal Audit Assistant. Hasil harus siap edit, beri bullet yang rapi. "
         "Sertakan citation (doc, page) di setiap sub-poin yang berasal dari dokumen."
     )
-    # Optional retrieval when payload carries 'query' or 'scope'
+    # Optional retrieval when payload carries 'query' or 'scope', narrowed by `filters` (the
+    # router validates payload 'filters' into it)
     query = req.payload.get("query") or req.payload.get("scope") or ""
-    retrieved = await retrieve(query, 5) if query else []
-    context = "\n\n".join([f"(doc:{c.filename}, page:{c.page}) {c.snippet}" for c in retrieved])
+    retrieved = await retrieve(query, 5, filters=filters) if query else []
+    packed = await pack_context(retrieved)
+    context, included = packed.text, packed.chunk_ids
     messages = [
         {
             "role": "user",
             "content": f"{instruction}\n\nInput pengguna: {req.payload}\n\nKonteks dokumen:\n{context}",
         }
     ]
-    answer = llm_client.chat(base_prompt, messages)
+    answer = (await llm_client.achat(base_prompt, messages)).text
     citations = [
         Citation(
             document_id=c.document_id, filename=c.filename, page=c.page, chunk_id=c.chunk_id, snippet=c.snippet[:200]
         )
         for c in retrieved
+        if c.chunk_id in included
     ]
     return AgentResponse(content=answer, citations=citations)
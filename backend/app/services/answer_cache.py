@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from ..schemas import Citation
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    citations: List[Citation]
+
+
+@dataclass
+class _Entry:
+    embedding: np.ndarray  # unit-normalized query embedding
+    chunk_ids: FrozenSet[int]
+    value: CachedAnswer
+    created: float
+
+
+class AnswerCache:
+    """In-memory semantic cache of chat answers.
+
+    An entry matches when the retrieved chunk-id set is identical (so any change in what the
+    knowledge base returns invalidates it) and the query embedding's cosine similarity is at
+    least `threshold`. Entries expire after `ttl` seconds; the least recently used are evicted
+    beyond `max_entries`. Chunk ids are SQLite rowids that later inserts may reuse, so entries
+    built on deleted chunks are dropped by `invalidate_chunks`.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_chunks: Dict[FrozenSet[int], List[int]] = {}
+        self._next_id = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype="float32")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._by_chunks[entry.chunk_ids]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_chunks[entry.chunk_ids]
+
+    def get(self, embedding: List[float], chunk_ids: List[int]) -> Optional[CachedAnswer]:
+        key = frozenset(chunk_ids)
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_sim = None, self.threshold
+            for entry_id in list(self._by_chunks.get(key, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl:
+                    self._drop(entry_id)
+                    self.expirations += 1
+                    continue
+                sim = float(np.dot(query, entry.embedding))
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].value
+
+    @property
+    def generation(self) -> int:
+        """Bumped by every invalidation; pass the value read before retrieval to `put`."""
+        return self._generation
+
+    def put(
+        self, embedding: List[float], chunk_ids: List[int], value: CachedAnswer, generation: Optional[int] = None
+    ) -> None:
+        key = frozenset(chunk_ids)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # chunks were deleted while the answer was generated; its ids may be stale
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(self._normalize(embedding), key, value, time.monotonic())
+            self._by_chunks.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_chunks(self, chunk_ids: Iterable[int]) -> None:
+        """Drop every answer whose context included one of `chunk_ids`."""
+        dead = set(chunk_ids)
+        with self._lock:
+            self._generation += 1
+            for entry_id in [i for i, entry in self._entries.items() if entry.chunk_ids & dead]:
+                self._drop(entry_id)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
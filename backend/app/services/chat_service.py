@@ -1,18 +1,36 @@
-from typing import List
+import json
+import logging
+from typing import AsyncIterator, Callable, List, Optional
 from sqlalchemy import insert
 
 from ..db import database, chat_sessions, chat_messages
 from ..schemas import ChatRequest, ChatResponse, Citation
-from .retrieval_service import retrieve
-from .llm_client import LLMClient
+from ..config import get_settings
+from .answer_cache import AnswerCache, CachedAnswer
+from .context_builder import PackedContext, pack_context
+from .index_writer import index_writer
+from .reranker import reranker
+from .retrieval_service import embed_query, retrieve
+from .llm_client import LLMClient, LLMStreamError
 
 SYSTEM_PROMPT = (
     "Peran: Internal Audit Assistant. Jawab ringkas, dalam bahasa Indonesia. "
     "Gunakan bukti dari dokumen. Sertakan citation dengan format (doc:filename, page:X). "
     "Jika tidak ada bukti, jawab 'Tidak ditemukan di knowledge base'."
 )
+NOT_FOUND_ANSWER = "Tidak ditemukan di knowledge base."
+STREAM_INTERRUPTED = "Jawaban terputus karena layanan LLM gagal. Silakan ulangi pertanyaan."
+STREAM_FAILED = "Terjadi kesalahan saat menyusun jawaban. Silakan ulangi pertanyaan."
 
+logger = logging.getLogger(__name__)
+settings = get_settings()
 llm_client = LLMClient()
+answer_cache = AnswerCache(
+    threshold=settings.answer_cache_threshold,
+    ttl=settings.answer_cache_ttl,
+    max_entries=settings.answer_cache_max_entries,
+)
+index_writer.on_delete(answer_cache.invalidate_chunks)
 
 
 async def _ensure_session(user: str, session_id: int | None) -> int:
@@ -21,44 +39,149 @@ async def _ensure_session(user: str, session_id: int | None) -> int:
     return await database.execute(insert(chat_sessions).values(user=user))
 
 
-def _build_context(chunks) -> str:
-    lines = []
-    for c in chunks:
-        cite = f"(doc:{c.filename}, page:{c.page or '?'}, chunk:{c.chunk_id})"
-        lines.append(f"{cite}\n{c.snippet}")
-    return "\n\n".join(lines)
+def _build_messages(query: str, packed: PackedContext) -> List[dict]:
+    return [{"role": "user", "content": f"Pertanyaan: {query}\n\nKonteks:\n{packed.text}\n\nJawab dengan citation."}]
 
 
-async def handle_chat(req: ChatRequest) -> ChatResponse:
-    session_id = await _ensure_session(req.user, req.session_id)
-    retrieved = await retrieve(req.query, req.max_retrieve)
+def _citations(retrieved, packed: PackedContext) -> List[Citation]:
+    """Citations for the retrieved chunks that made it into the packed context, in rank order."""
+    included = packed.chunk_ids
+    return [
+        Citation(
+            document_id=c.document_id,
+            filename=c.filename,
+            page=c.page,
+            chunk_id=c.chunk_id,
+            snippet=c.snippet[:200],
+        )
+        for c in retrieved
+        if c.chunk_id in included
+    ]
 
-    if not retrieved:
-        answer = "Tidak ditemukan di knowledge base."
-        citations: List[Citation] = []
-    else:
-        context = _build_context(retrieved)
-        messages = [
-            {"role": "user", "content": f"Pertanyaan: {req.query}\n\nKonteks:\n{context}\n\nJawab dengan citation."}
-        ]
-        answer = llm_client.chat(SYSTEM_PROMPT, messages)
-        citations = [
-            Citation(
-                document_id=c.document_id,
-                filename=c.filename,
-                page=c.page,
-                chunk_id=c.chunk_id,
-                snippet=c.snippet[:200],
-            )
-            for c in retrieved
-        ]
 
+async def _save_exchange(session_id: int, query: str, answer: str) -> None:
     await database.execute(
-        insert(chat_messages).values(session_id=session_id, role="user", content=req.query)
+        insert(chat_messages).values(session_id=session_id, role="user", content=query)
     )
     await database.execute(
         insert(chat_messages).values(session_id=session_id, role="assistant", content=answer)
     )
 
-    return ChatResponse(answer=answer, citations=citations, session_id=session_id)
 
+async def _retrieve_with_cache(req: ChatRequest):
+    """Retrieve context (reranking a larger candidate pool when enabled) and look up a cached
+    answer for it.
+
+    Returns (retrieved, cached answer or None, store callback for a freshly generated answer).
+    """
+    use_rerank = settings.rerank_enabled if req.rerank is None else req.rerank
+    generation = answer_cache.generation
+    query_emb = await embed_query(req.query)
+    retrieved = await retrieve(
+        req.query,
+        max(req.max_retrieve, settings.rerank_candidates) if use_rerank else req.max_retrieve,
+        query_emb=query_emb,
+        mode=req.retrieval_mode,
+        lexical_weight=req.lexical_weight,
+        filters=req.filters,
+    )
+    if use_rerank:
+        retrieved = await reranker.rerank(req.query, retrieved, req.max_retrieve)
+    if not retrieved or not settings.answer_cache_enabled:
+        return retrieved, None, lambda value: None
+    chunk_ids = [c.chunk_id for c in retrieved]
+    cached = answer_cache.get(query_emb, chunk_ids)
+    return retrieved, cached, lambda value: answer_cache.put(query_emb, chunk_ids, value, generation)
+
+
+async def handle_chat(req: ChatRequest) -> ChatResponse:
+    session_id = await _ensure_session(req.user, req.session_id)
+    retrieved, cached, remember = await _retrieve_with_cache(req)
+
+    context_tokens = 0
+    if not retrieved:
+        answer = NOT_FOUND_ANSWER
+        citations: List[Citation] = []
+    elif cached:
+        answer, citations = cached.answer, cached.citations
+    else:
+        packed = await pack_context(retrieved)
+        context_tokens = packed.tokens_used
+        reply = await llm_client.achat(SYSTEM_PROMPT, _build_messages(req.query, packed))
+        answer = reply.text
+        citations = _citations(retrieved, packed)
+        if reply.complete:  # never serve a fallback answer to later questions
+            remember(CachedAnswer(answer, citations))
+
+    await _save_exchange(session_id, req.query, answer)
+
+    return ChatResponse(answer=answer, citations=citations, session_id=session_id, context_tokens=context_tokens)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chat(req: ChatRequest) -> AsyncIterator[str]:
+    """Retrieve and pack the context, then return the server-sent events of the answer.
+
+    Setup runs before the response starts, so its errors (e.g. an index mismatch) still become
+    HTTP errors. The events: `citations` (with session_id and context_tokens), then `delta`
+    events with answer text, then `done`. The exchange is saved once the answer is complete.
+    If anything fails mid-stream (e.g. the provider cuts off the answer) the stream ends with an
+    `error` event instead of `done` and nothing is saved."""
+    session_id = await _ensure_session(req.user, req.session_id)
+    retrieved, cached, remember = await _retrieve_with_cache(req)
+    packed = None
+    if cached:
+        citations = cached.citations
+    elif retrieved:
+        packed = await pack_context(retrieved)
+        citations = _citations(retrieved, packed)
+    else:
+        citations = []
+    return _answer_events(req, session_id, retrieved, cached, remember, packed, citations)
+
+
+async def _answer_events(
+    req: ChatRequest,
+    session_id: int,
+    retrieved: list,
+    cached: Optional[CachedAnswer],
+    remember: Callable[[CachedAnswer], None],
+    packed: Optional[PackedContext],
+    citations: List[Citation],
+) -> AsyncIterator[str]:
+    yield _sse(
+        "citations",
+        {
+            "session_id": session_id,
+            "citations": [c.model_dump() for c in citations],
+            "context_tokens": packed.tokens_used if packed else 0,
+        },
+    )
+    try:
+        if not retrieved or cached:
+            answer = cached.answer if cached else NOT_FOUND_ANSWER
+            yield _sse("delta", {"text": answer})
+        else:
+            parts = []
+            stream = llm_client.astream_chat(SYSTEM_PROMPT, _build_messages(req.query, packed))
+            async for delta in stream:
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+            answer = "".join(parts)
+            if stream.complete:  # fallback and cut-off answers are not cached
+                remember(CachedAnswer(answer, citations))
+        await _save_exchange(session_id, req.query, answer)
+    except LLMStreamError:
+        # The answer is cut off: tell the client instead of finishing normally, and keep the
+        # partial text out of the chat history and the cache.
+        yield _sse("error", {"session_id": session_id, "message": STREAM_INTERRUPTED})
+        return
+    except Exception:
+        # The 200 status is already sent; an error event is the only way left to report it.
+        logger.exception("Chat stream failed")
+        yield _sse("error", {"session_id": session_id, "message": STREAM_FAILED})
+        return
+    yield _sse("done", {"session_id": session_id})
@@ -1,4 +1,6 @@
-from typing import List, Tuple
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Sequence, Tuple
 import tiktoken
 
 
@@ -16,17 +18,144 @@ def count_tokens(text: str) -> int:
     return len(enc.encode(text))
 
 
-def chunk_text(text: str, chunk_size: int = 900, overlap: int = 120) -> List[Tuple[str, int]]:
-    """Return list of (chunk_text, token_count)."""
+def truncate_tokens(text: str, max_tokens: int) -> str:
     tokens = enc.encode(text)
-    chunks = []
-    start = 0
-    while start < len(tokens):
-        end = min(len(tokens), start + chunk_size)
-        window = tokens[start:end]
-        chunk_str = enc.decode(window)
-        chunks.append((chunk_str, len(window)))
-        start = end - overlap
-        if start < 0:
-            start = 0
-    return chunks
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+
+
+# Preferred places to end a chunk, strongest first: paragraph break, sentence end, line break.
+_BOUNDARIES = (re.compile(r"\n\s*\n"), re.compile(r"[.!?;:](?=\s)"), re.compile(r"\n"))
+_PAGE_SEPARATOR = "\n\n"
+
+
+def _windows(
+    text: str,
+    chunk_size: int,
+    overlap: int,
+    respect_boundaries: bool,
+    start_char: int = 0,
+    stable_char: Optional[int] = None,
+) -> Tuple[List[Tuple[int, int, int]], Optional[int]]:
+    """Tokenize `text` once and return ((char_start, char_end, token_count) per chunk, resume).
+
+    Windows are chosen on token indices and mapped back to the original string through the
+    token character offsets, so no window is ever decoded. With `respect_boundaries` a window
+    is pulled back to the last paragraph/sentence/line break in its second half. The first
+    window starts at the token beginning at `start_char`. With `stable_char`, `text` is only
+    the beginning of a longer stream: windows stop before the first one that could still change
+    once text is appended after `stable_char`, and `resume` is where that window starts
+    (None when `text` was chunked to its end).
+    """
+    tokens = enc.encode(text)
+    if not tokens:
+        return [], None
+    _, offsets = enc.decode_with_offsets(tokens)
+    n = len(tokens)
+    limit = n if stable_char is None else bisect_left(offsets, stable_char)
+    windows = []
+    start = bisect_left(offsets, start_char)
+    while True:
+        if start + chunk_size > limit and stable_char is not None:
+            return windows, offsets[start]
+        end = min(n, start + chunk_size)
+        if end < n and respect_boundaries:
+            lo = offsets[min(end, start + max(chunk_size // 2, overlap + 1))]
+            for pattern in _BOUNDARIES:
+                cut = None
+                for match in pattern.finditer(text, lo, offsets[end]):
+                    cut = match.end()
+                if cut is not None:
+                    # end on the last token boundary at or before the break
+                    end = max(bisect_right(offsets, cut) - 1, start + overlap + 1)
+                    break
+        char_end = offsets[end] if end < n else len(text)
+        windows.append((offsets[start], char_end, end - start))
+        if end >= n:
+            return windows, None
+        start = max(end - overlap, start + 1)
+
+
+def chunk_text(
+    text: str, chunk_size: int = 900, overlap: int = 120, respect_boundaries: bool = False
+) -> List[Tuple[str, int]]:
+    """Return list of (chunk_text, token_count)."""
+    windows, _ = _windows(text, chunk_size, overlap, respect_boundaries)
+    return [(text[a:b], count) for a, b, count in windows]
+
+
+Page = Tuple[Optional[int], str]
+# Pages not fully chunked yet and the character offset (in their joined text) to resume at.
+PendingPages = Tuple[List[Page], int]
+
+
+def _join_pages(pages: Sequence[Page]) -> Tuple[str, List[Optional[int]], List[int]]:
+    """Join non-empty pages with _PAGE_SEPARATOR; returns (text, page numbers, page offsets)."""
+    page_nums: List[Optional[int]] = []
+    page_starts: List[int] = []
+    parts: List[str] = []
+    pos = 0
+    for page_num, page_text in pages:
+        if parts:
+            parts.append(_PAGE_SEPARATOR)
+            pos += len(_PAGE_SEPARATOR)
+        page_nums.append(page_num)
+        page_starts.append(pos)
+        parts.append(page_text)
+        pos += len(page_text)
+    return "".join(parts), page_nums, page_starts
+
+
+def _rows(text: str, page_nums, page_starts, windows) -> List[dict]:
+    return [
+        {
+            "text": text[a:b],
+            "page_start": page_nums[bisect_right(page_starts, a) - 1],
+            "page_end": page_nums[bisect_right(page_starts, b - 1) - 1],
+            "token_count": count,
+        }
+        for a, b, count in windows
+    ]
+
+
+def chunk_pages(
+    pages: Sequence[Page],
+    chunk_size: int = 900,
+    overlap: int = 120,
+    respect_boundaries: bool = True,
+) -> List[dict]:
+    """Chunk consecutive pages as one stream so chunks may span pages.
+
+    Returns chunk rows (text, page_start, page_end, token_count); pages without text are skipped
+    and a chunk's page range is derived from the character offsets it covers.
+    """
+    text, page_nums, page_starts = _join_pages([page for page in pages if page[1].strip()])
+    windows, _ = _windows(text, chunk_size, overlap, respect_boundaries)
+    return _rows(text, page_nums, page_starts, windows)
+
+
+def chunk_pages_stream(
+    pending: Optional[PendingPages],
+    pages: Sequence[Page],
+    final: bool,
+    chunk_size: int = 900,
+    overlap: int = 120,
+    respect_boundaries: bool = True,
+) -> Tuple[List[dict], Optional[PendingPages]]:
+    """`chunk_pages` for a document that arrives in consecutive batches of pages.
+
+    Returns the chunk rows that are final after `pages` and the pending state to pass with the
+    next batch (`final` on the last one). The concatenated rows equal `chunk_pages` over the
+    whole document: only the last page is held back as unstable (text appended to it could
+    change its final tokens), and the held pages are re-chunked from a page start, where the
+    tokenization matches the whole document's.
+    """
+    kept, resume = pending or ([], 0)
+    pages = kept + [page for page in pages if page[1].strip()]
+    text, page_nums, page_starts = _join_pages(pages)
+    stable = None if final or not pages else page_starts[-1]
+    windows, resume = _windows(text, chunk_size, overlap, respect_boundaries, resume, stable)
+    rows = _rows(text, page_nums, page_starts, windows)
+    if resume is None:
+        return rows, None if final else ([], 0)
+    first = bisect_right(page_starts, resume) - 1
+    return rows, (pages[first:], resume - page_starts[first])
@@ -0,0 +1,139 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..db import database, chunks
+from ..schemas import ChunkMetadata
+from .chunking import count_tokens, truncate_tokens
+
+settings = get_settings()
+
+# Blocks that would be cut below this many tokens are skipped instead of truncated.
+_MIN_PARTIAL_TOKENS = 64
+_OVERLAP_PROBE_CHARS = 32
+_BLOCK_SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextBlock:
+    """A run of consecutive chunks from one document, merged into a single passage."""
+
+    document_id: int
+    filename: str
+    rank: int
+    chunk_ids: List[int] = field(default_factory=list)
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    text: str = ""
+
+    def header(self) -> str:
+        if self.page_start is None:
+            pages = "?"
+        elif self.page_end and self.page_end != self.page_start:
+            pages = f"{self.page_start}-{self.page_end}"
+        else:
+            pages = str(self.page_start)
+        chunk_ids = ",".join(str(cid) for cid in self.chunk_ids)
+        return f"(doc:{self.filename}, page:{pages}, chunk:{chunk_ids})"
+
+
+@dataclass
+class PackedContext:
+    text: str
+    blocks: List[ContextBlock]
+    tokens_used: int
+
+    @property
+    def chunk_ids(self) -> set:
+        return {cid for block in self.blocks for cid in block.chunk_ids}
+
+
+def _join_overlapping(prev: str, nxt: str) -> str:
+    """Concatenate two consecutive chunks, dropping the overlap chunk_text repeats."""
+    window = settings.chunk_overlap * 8  # overlap is CHUNK_OVERLAP tokens; 8 chars/token is generous
+    probe = nxt[:_OVERLAP_PROBE_CHARS]
+    if probe:
+        pos = prev.find(probe, max(0, len(prev) - window))
+        while pos != -1:
+            if nxt.startswith(prev[pos:]):
+                return prev + nxt[len(prev) - pos :]
+            pos = prev.find(probe, pos + 1)
+    return f"{prev}\n{nxt}"
+
+
+async def pack_context(retrieved: List[ChunkMetadata], token_budget: Optional[int] = None) -> PackedContext:
+    """Build the prompt context from retrieved chunks.
+
+    Hits on consecutive chunks of the same document are merged into one block with their
+    overlap removed, blocks are ordered by their best retrieval rank, and full chunk text is
+    packed until `token_budget` (CONTEXT_TOKEN_BUDGET) is reached, separators between blocks
+    included. A block that does not fit is truncated to the remaining budget when that is
+    worth it, otherwise skipped.
+    """
+    budget = token_budget or settings.context_token_budget
+    if not retrieved:
+        return PackedContext(text="", blocks=[], tokens_used=0)
+    rank_of = {c.chunk_id: rank for rank, c in enumerate(retrieved)}
+    meta_of = {c.chunk_id: c for c in retrieved}
+    rows = await database.fetch_all(
+        select(
+            chunks.c.id,
+            chunks.c.document_id,
+            chunks.c.chunk_index,
+            chunks.c.text,
+            chunks.c.page_start,
+            chunks.c.page_end,
+        )
+        .where(chunks.c.id.in_(list(rank_of)))
+        .order_by(chunks.c.document_id, chunks.c.chunk_index)
+    )
+
+    blocks: List[ContextBlock] = []
+    last_index = None
+    for row in rows:
+        current = blocks[-1] if blocks else None
+        if current is None or current.document_id != row["document_id"] or row["chunk_index"] != last_index + 1:
+            current = ContextBlock(
+                document_id=row["document_id"],
+                filename=meta_of[row["id"]].filename,
+                rank=rank_of[row["id"]],
+                page_start=row["page_start"],
+                text=row["text"],
+            )
+            blocks.append(current)
+        else:
+            current.rank = min(current.rank, rank_of[row["id"]])
+            current.text = _join_overlapping(current.text, row["text"])
+        current.chunk_ids.append(row["id"])
+        current.page_end = row["page_end"] if row["page_end"] is not None else current.page_end
+        last_index = row["chunk_index"]
+    blocks.sort(key=lambda b: b.rank)
+
+    packed: List[ContextBlock] = []
+    parts: List[str] = []
+    used = 0
+    separator_tokens = count_tokens(_BLOCK_SEPARATOR)
+    for block in blocks:
+        passage = f"{block.header()}\n{block.text}"
+        tokens = count_tokens(passage)
+        separator = separator_tokens if parts else 0
+        if used + separator + tokens > budget:
+            remaining = budget - used - separator
+            if remaining < _MIN_PARTIAL_TOKENS:
+                continue  # a smaller, lower-ranked block may still fit
+            passage = truncate_tokens(passage, remaining)
+            tokens = remaining
+        parts.append(passage)
+        packed.append(block)
+        used += separator + tokens
+        if used >= budget:
+            break
+    text = _BLOCK_SEPARATOR.join(parts)
+    tokens_used = count_tokens(text)
+    if tokens_used > budget:
+        # BPE may merge tokens across the joins, so the summed counts can be off by a few.
+        text = truncate_tokens(text, budget)
+        tokens_used = count_tokens(text)
+    return PackedContext(text=text, blocks=packed, tokens_used=tokens_used)
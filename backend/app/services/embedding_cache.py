@@ -0,0 +1,126 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..config import get_settings
+
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Disk-backed, content-addressed embedding cache with LRU eviction by total size.
+
+    Keys are sha256(model_id, normalized text); vectors are stored as float32 (or float16)
+    blobs in a dedicated SQLite file so re-ingests, index rebuilds and repeated queries skip
+    the provider. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int, float16: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.dtype = np.float16 if float16 else np.float32
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start : start + _SQL_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, r[0]) for r in rows]
+                    )
+            self._conn.execute("COMMIT")
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        dtype = np.dtype(self.dtype).str
+        rows = [(key, dtype, np.asarray(vec, dtype=self.dtype).tobytes(), now) for key, vec in items.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._bytes += sum(len(r[2]) for r in rows)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.execute("COMMIT")
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT ?", (_SQL_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._bytes = 0
+                break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(r[0],) for r in rows])
+            self._bytes -= sum(r[1] for r in rows)
+            self.evictions += len(rows)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+@lru_cache
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    settings = get_settings()
+    if not settings.embed_cache_enabled:
+        return None
+    return EmbeddingCache(
+        settings.embed_cache_path,
+        max_bytes=settings.embed_cache_max_mb * 1024 * 1024,
+        float16=settings.embed_cache_float16,
+    )
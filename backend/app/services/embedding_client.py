@@ -1,70 +1,175 @@
-from typing import List
+import asyncio
+from typing import Any, List, Optional, Tuple
 import logging
 
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..config import get_settings
+from .chunking import count_tokens
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .gemini import configure_gemini
+from .http_pool import get_http_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+LOCAL_MODEL = "all-MiniLM-L6-v2"
+REMOTE_MODELS = {
+    "gemini": "models/text-embedding-004",
+    "google": "models/text-embedding-004",
+    "openai": "text-embedding-3-small",
+    "openrouter": "openrouter/clip-vit-base-patch16",
+}
+
+
+class EmbeddingFallbackError(RuntimeError):
+    """The provider failed and the vectors came from the local fallback model instead."""
+
+
+def configured_model_id() -> str:
+    """"provider:model" of the embedding model the current settings select."""
+    provider = settings.embed_provider.lower()
+    if settings.embed_api_key and provider in REMOTE_MODELS:
+        return f"{provider}:{REMOTE_MODELS[provider]}"
+    return f"local:{LOCAL_MODEL}"
+
+
+def _micro_batches(texts: List[str], max_count: int, max_tokens: int) -> List[List[str]]:
+    """Split texts into consecutive batches bounded by item count and total tokens.
+
+    A single text larger than `max_tokens` gets a batch of its own.
+    """
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and (len(current) >= max_count or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
 
 class EmbeddingClient:
-    """Simple embedding client with cloud-first, local fallback."""
+    """Async embedding client with cloud-first, local fallback.
+
+    Cloud calls are split into micro-batches (EMBED_BATCH_SIZE texts / EMBED_BATCH_TOKENS tokens)
+    with at most EMBED_CONCURRENCY in flight, each retried on its own, over the shared pooled
+    HTTP client. The local model encodes the whole list in one batched call in a worker thread.
+    Results are served from / written to the shared EmbeddingCache when EMBED_CACHE_ENABLED is set.
+    """
 
     def __init__(self):
         self.provider = settings.embed_provider.lower()
         self.api_key = settings.embed_api_key
         self._local_model = None
+        self._sdk_client: Any = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.cache = get_embedding_cache()
+        if self.provider in {"gemini", "google"} and self.api_key:
+            configure_gemini(self.api_key)
 
     def _ensure_local(self):
         if self._local_model:
             return
         from sentence_transformers import SentenceTransformer
 
-        self._local_model = SentenceTransformer("all-MiniLM-L6-v2")
+        self._local_model = SentenceTransformer(LOCAL_MODEL)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=4))
-    def embed(self, texts: List[str]) -> List[List[float]]:
-        if self.provider in {"gemini", "google"} and self.api_key:
-            try:
-                import google.generativeai as genai
-
-                genai.configure(api_key=self.api_key)
-                model = "models/text-embedding-004"
-                res = genai.embed_content(model=model, content=texts)
-                # API returns {"embedding": [...]} for single; list for batch
-                if "embeddings" in res:
-                    return [item["embedding"] for item in res["embeddings"]]
-                if "embedding" in res:
-                    return [res["embedding"]]
-            except Exception as exc:  # pragma: no cover - safeguard
-                logger.warning("Gemini embedding failed, falling back to local. %s", exc)
-
-        if self.provider == "openai" and self.api_key:
-            try:
-                from openai import OpenAI
+    def _encode_local(self, texts: List[str]) -> List[List[float]]:
+        self._ensure_local()
+        return self._local_model.encode(texts, batch_size=settings.embed_local_batch_size).tolist()
 
-                client = OpenAI(api_key=self.api_key)
-                response = client.embeddings.create(model="text-embedding-3-small", input=texts)
-                return [d.embedding for d in response.data]
-            except Exception as exc:  # pragma: no cover
-                logger.warning("OpenAI embedding failed, falling back to local. %s", exc)
+    @property
+    def _uses_remote(self) -> bool:
+        return bool(self.api_key) and self.provider in REMOTE_MODELS
 
-        if self.provider == "openrouter" and self.api_key:
-            import httpx
+    @property
+    def model_id(self) -> str:
+        """Identifies the model whose vectors `aembed` returns when the provider is healthy."""
+        return configured_model_id()
 
-            headers = {"Authorization": f"Bearer {self.api_key}"}
-            body = {"model": "openrouter/clip-vit-base-patch16", "input": texts}
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=4))
+    async def _embed_remote(self, texts: List[str]) -> List[List[float]]:
+        if self.provider in {"gemini", "google"}:
+            import google.generativeai as genai
+
+            res = await genai.embed_content_async(model=REMOTE_MODELS[self.provider], content=texts)
+            # Batch requests return {"embedding": [[...], ...]}; single ones a flat vector
+            if "embeddings" in res:
+                return [item["embedding"] for item in res["embeddings"]]
+            emb = res["embedding"]
+            return emb if emb and isinstance(emb[0], list) else [emb]
+
+        if self.provider == "openai":
+            if self._sdk_client is None:
+                from openai import AsyncOpenAI
+
+                self._sdk_client = AsyncOpenAI(api_key=self.api_key, http_client=get_http_client())
+            response = await self._sdk_client.embeddings.create(model=REMOTE_MODELS["openai"], input=texts)
+            return [d.embedding for d in response.data]
+
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        body = {"model": REMOTE_MODELS["openrouter"], "input": texts}
+        r = await get_http_client().post(
+            "https://openrouter.ai/api/v1/embeddings", json=body, headers=headers, timeout=30
+        )
+        r.raise_for_status()
+        data = r.json()
+        return [item["embedding"] for item in data.get("data", [])]
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.embed_concurrency)
+        async with self._semaphore:
+            return await self._embed_remote(texts)
+
+    async def aembed(self, texts: List[str], strict: bool = False) -> List[List[float]]:
+        """Vectors for `texts`. On a provider failure they come from the local fallback model,
+        unless `strict`: then EmbeddingFallbackError is raised, for vectors that are stored in
+        the index under `model_id`."""
+        if not texts:
+            return []
+        if self.cache is None:
+            vectors, produced_by = await self._embed_uncached(texts)
+            self._check_model(produced_by, strict)
+            return vectors
+
+        model_id = self.model_id
+        keys = [EmbeddingCache.key(model_id, text) for text in texts]
+        found = await asyncio.to_thread(self.cache.get_many, keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            vectors, produced_by = await self._embed_uncached([texts[i] for i in missing])
+            self._check_model(produced_by, strict)
+            fresh = {keys[i]: vec for i, vec in zip(missing, vectors)}
+            # Fallback vectors come from another model and must not be filed under this one.
+            if produced_by == model_id:
+                await asyncio.to_thread(self.cache.put_many, fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def _check_model(self, produced_by: str, strict: bool) -> None:
+        if strict and produced_by != self.model_id:
+            raise EmbeddingFallbackError(
+                f"Embedding provider failed and {produced_by} answered instead of {self.model_id}."
+            )
+
+    async def _embed_uncached(self, texts: List[str]) -> Tuple[List[List[float]], str]:
+        """Return (vectors, model_id of the model that produced them)."""
+        if self._uses_remote:
+            batches = await asyncio.to_thread(
+                _micro_batches, texts, settings.embed_batch_size, settings.embed_batch_tokens
+            )
             try:
-                r = httpx.post("https://openrouter.ai/api/v1/embeddings", json=body, headers=headers, timeout=30)
-                r.raise_for_status()
-                data = r.json()
-                return [item["embedding"] for item in data.get("data", [])]
-            except Exception as exc:  # pragma: no cover
-                logger.warning("OpenRouter embedding failed, falling back to local. %s", exc)
+                results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+                return [vec for batch in results for vec in batch], self.model_id
+            except Exception as exc:  # pragma: no cover - safeguard
+                logger.warning("%s embedding failed, falling back to local. %s", self.provider, exc)
 
         # Local fallback
-        self._ensure_local()
-        return [self._local_model.encode(text).tolist() for text in texts]
-
+        return await asyncio.to_thread(self._encode_local, texts), f"local:{LOCAL_MODEL}"
@@ -0,0 +1,23 @@
+from typing import Optional
+
+_configured_key: Optional[str] = None
+
+
+def configure_gemini(api_key: str) -> None:
+    """Configure google.generativeai once per process.
+
+    `genai.configure` sets a single global key, so the LLM and embedding clients must agree on
+    it; a second, different key raises instead of silently replacing the first.
+    """
+    global _configured_key
+    if _configured_key == api_key:
+        return
+    if _configured_key is not None:
+        raise RuntimeError(
+            "LLM_API_KEY and EMBED_API_KEY differ, but google.generativeai uses one key per "
+            "process. Use the same Gemini key for both (or another provider for one of them)."
+        )
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    _configured_key = api_key
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional, Union
+
+from sqlalchemy import insert, select
+
+from ..db import database, chunks, documents, embeddings_index_map
+from ..vector_store.index_manager import index_manager
+from .embedding_client import configured_model_id
+
+logger = logging.getLogger(__name__)
+
+_MAX_GROUP = 64
+# Keeps multi-row INSERTs under SQLite's historical 999 bound-parameter limit.
+_MAX_PARAMS = 990
+
+
+@dataclass
+class _WriteRequest:
+    document: dict
+    chunk_rows: List[dict]
+    embeddings: List[List[float]]
+    future: asyncio.Future = field(repr=False)
+    replaces: Optional[int] = None
+
+
+@dataclass
+class _DeleteRequest:
+    document_id: int
+    future: asyncio.Future = field(repr=False)
+
+
+async def _insert_rows(table, rows: List[dict], returning=None) -> list:
+    """Multi-row INSERT in batches; returns the RETURNING rows when `returning` is given."""
+    if not rows:
+        return []
+    per_stmt = max(1, _MAX_PARAMS // len(rows[0]))
+    returned = []
+    for start in range(0, len(rows), per_stmt):
+        stmt = insert(table).values(rows[start : start + per_stmt])
+        if returning is not None:
+            returned.extend(await database.fetch_all(stmt.returning(*returning)))
+        else:
+            await database.execute(stmt)
+    return returned
+
+
+class IndexWriter:
+    """Single consumer for every document, chunk, embeddings_index_map and FAISS write.
+
+    Ingest requests enqueue a fully prepared document (metadata, chunk rows, embeddings) and
+    await its id; deletes enqueue a document id. The writer task drains whatever is queued
+    and commits it as one SQLite transaction and one FAISS segment plus tombstones (group
+    commit), then resolves the callers. Chunk ids come from SQLite and double as vector ids,
+    so there is no shared counter to race on, and because this is the only writer the
+    duplicate check below cannot race either.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Bumped once a group's SQLite transaction has committed; the index version is bumped
+        # inside it, so readers keying caches on SQL state use this instead.
+        self.commits = 0
+        self._delete_listeners: List[Callable[[List[int]], None]] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="index-writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(
+        self,
+        document: dict,
+        chunk_rows: List[dict],
+        embeddings: List[List[float]],
+        replaces: Optional[int] = None,
+    ) -> int:
+        """Queue a document for commit and return its id (or the id of an existing duplicate).
+
+        `document` holds `documents` column values including file_hash; `chunk_rows` hold
+        text / page_start / page_end / token_count in chunk order, aligned with `embeddings`.
+        With `replaces`, that document is deleted in the same transaction the new one lands in.
+        """
+        future = self._new_future()
+        await self._queue.put(_WriteRequest(document, chunk_rows, embeddings, future, replaces))
+        return await future
+
+    async def delete(self, document_id: int) -> bool:
+        """Delete a document with its chunks and map rows and tombstone its vectors.
+
+        Returns False if the document does not exist.
+        """
+        future = self._new_future()
+        await self._queue.put(_DeleteRequest(document_id, future))
+        return await future
+
+    def on_delete(self, listener: Callable[[List[int]], None]) -> None:
+        """Call `listener` with the chunk ids of deleted (or replaced) documents after each
+        commit that removes some. SQLite may hand those ids to later chunks."""
+        self._delete_listeners.append(listener)
+
+    def _new_future(self) -> asyncio.Future:
+        if self._task is None:
+            raise RuntimeError("IndexWriter is not running; call start() first.")
+        return asyncio.get_running_loop().create_future()
+
+    async def _run(self) -> None:
+        while True:
+            group = [await self._queue.get()]
+            while len(group) < _MAX_GROUP and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+            try:
+                results = await self._commit(group)
+            except Exception as exc:
+                logger.exception("Index write of %d request(s) failed", len(group))
+                for req in group:
+                    if not req.future.done():
+                        req.future.set_exception(exc)
+            else:
+                for req, result in zip(group, results):
+                    if not req.future.done():
+                        req.future.set_result(result)
+            finally:
+                for _ in group:
+                    self._queue.task_done()
+
+    async def _delete_document(self, document_id: int, dead_vector_ids: List[int]) -> bool:
+        if await database.fetch_one(select(documents.c.id).where(documents.c.id == document_id)) is None:
+            return False
+        doc_chunks = select(chunks.c.id).where(chunks.c.document_id == document_id)
+        rows = await database.fetch_all(
+            select(embeddings_index_map.c.faiss_vector_id).where(embeddings_index_map.c.chunk_id.in_(doc_chunks))
+        )
+        dead_vector_ids.extend(row[0] for row in rows)
+        await database.execute(embeddings_index_map.delete().where(embeddings_index_map.c.chunk_id.in_(doc_chunks)))
+        await database.execute(chunks.delete().where(chunks.c.document_id == document_id))
+        await database.execute(documents.delete().where(documents.c.id == document_id))
+        return True
+
+    async def _commit(self, group: List[Union[_WriteRequest, _DeleteRequest]]) -> list:
+        results: list = []
+        chunk_ids: List[int] = []
+        embeddings: List[List[float]] = []
+        dead_vector_ids: List[int] = []
+        async with database.transaction():
+            for req in group:
+                if isinstance(req, _DeleteRequest):
+                    results.append(await self._delete_document(req.document_id, dead_vector_ids))
+                    continue
+                existing = await database.fetch_one(
+                    select(documents.c.id).where(documents.c.file_hash == req.document["file_hash"])
+                )
+                if existing:
+                    results.append(existing[0])
+                    continue
+                # Explicit: `databases` skips Python-side defaults, and older tables have no SQL one.
+                row = {"uploaded_at": datetime.utcnow(), **req.document}
+                doc_id = await database.execute(documents.insert().values(**row))
+                rows = [{**row, "document_id": doc_id, "chunk_index": idx} for idx, row in enumerate(req.chunk_rows)]
+                returned = await _insert_rows(chunks, rows, returning=(chunks.c.id, chunks.c.chunk_index))
+                # RETURNING order is unspecified in SQLite; realign with the embeddings by chunk_index.
+                ids_by_index = {r["chunk_index"]: r["id"] for r in returned}
+                chunk_ids.extend(ids_by_index[idx] for idx in range(len(rows)))
+                embeddings.extend(req.embeddings)
+                if req.replaces is not None:
+                    await self._delete_document(req.replaces, dead_vector_ids)
+                results.append(doc_id)
+
+            if dead_vector_ids:
+                # Tombstone before adding: SQLite may already have reused a deleted chunk id in
+                # this group, and add() purges the old vector of any tombstoned id it is given.
+                await asyncio.to_thread(index_manager.remove, dead_vector_ids)
+            if chunk_ids:
+                await _insert_rows(
+                    embeddings_index_map, [{"chunk_id": cid, "faiss_vector_id": cid} for cid in chunk_ids]
+                )
+                # The manifest rename inside add() is the commit point: if it fails everything rolls back.
+                # Callers embed with aembed(strict=True), so the vectors are the configured model's.
+                await asyncio.to_thread(index_manager.add, embeddings, chunk_ids, configured_model_id())
+        self.commits += 1
+        if dead_vector_ids:
+            for listener in self._delete_listeners:
+                listener(dead_vector_ids)  # vector ids are chunk ids
+        return results
+
+
+index_writer = IndexWriter()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..db import database, ingest_jobs
+from .ingest_service import ingest_file
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def _insert_job(**fields) -> int:
+    # Set every column the status endpoint reads: tables created before they had SQL
+    # defaults would otherwise store NULL.
+    now = datetime.utcnow()
+    return await database.execute(
+        ingest_jobs.insert().values(
+            pages_parsed=0, chunks_total=0, chunks_embedded=0, created_at=now, updated_at=now, **fields
+        )
+    )
+
+
+async def _update(job_id: int, **fields) -> None:
+    await database.execute(
+        ingest_jobs.update().where(ingest_jobs.c.id == job_id).values(**fields, updated_at=datetime.utcnow())
+    )
+
+
+class IngestJobQueue:
+    """Queue of ingest jobs persisted in `ingest_jobs` and processed by a pool of worker tasks.
+
+    Uploads are spooled to disk and enqueued; workers run `ingest_file` (whose parsing runs in
+    a process pool) and record progress and stage timings on the job row. Jobs still queued or running
+    when the process stopped are picked up again on start.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        pending = await database.fetch_all(
+            select(ingest_jobs.c.id).where(ingest_jobs.c.status.in_(["queued", "running"])).order_by(ingest_jobs.c.id)
+        )
+        for row in pending:
+            self._queue.put_nowait(row["id"])
+        if pending:
+            logger.info("Resuming %d unfinished ingest job(s)", len(pending))
+        self._tasks = [asyncio.create_task(self._worker(), name=f"ingest-worker-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(
+        self,
+        file_path: Path,
+        filename: str,
+        source_unit: Optional[str],
+        year: Optional[int],
+        tags: Optional[dict],
+        file_hash: Optional[str] = None,
+        replaces_document_id: Optional[int] = None,
+    ) -> int:
+        job_id = await _insert_job(
+            status="queued",
+            filename=filename,
+            file_path=str(file_path),
+            file_hash=file_hash,
+            source_unit=source_unit,
+            year=year,
+            tags=tags,
+            replaces_document_id=replaces_document_id,
+        )
+        await self._queue.put(job_id)
+        return job_id
+
+    async def record_duplicate(self, filename: str, file_hash: str, document_id: int) -> int:
+        """Record an upload that matched an existing document as an already finished job."""
+        return await _insert_job(
+            status="done", filename=filename, file_path="", file_hash=file_hash, document_id=document_id
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job_id: int) -> None:
+        job = await database.fetch_one(select(ingest_jobs).where(ingest_jobs.c.id == job_id))
+        if job is None:
+            return
+        file_path = Path(job["file_path"])
+        if not file_path.exists():
+            await _update(job_id, status="failed", error="Uploaded file is no longer available.")
+            return
+
+        await _update(job_id, status="running", error=None)
+
+        async def progress(**counters) -> None:
+            await _update(job_id, **counters)
+
+        try:
+            doc_id = await ingest_file(
+                file_path,
+                filename=job["filename"],
+                source_unit=job["source_unit"],
+                year=job["year"],
+                tags=job["tags"],
+                progress=progress,
+                file_hash=job["file_hash"],
+                replaces=job["replaces_document_id"],
+            )
+        except Exception as exc:
+            logger.exception("Ingest job %s failed", job_id)
+            await _update(job_id, status="failed", error=str(exc))
+        else:
+            await _update(job_id, status="done", document_id=doc_id)
+        # Gone after a successful ingest (moved into upload_dir); a failed or duplicate upload is
+        # discarded. Not on cancellation (shutdown) or a crash: the resumed job needs the file.
+        file_path.unlink(missing_ok=True)
+
+
+ingest_queue = IngestJobQueue(settings.ingest_workers)
@@ -1,20 +1,30 @@
+import asyncio
 import hashlib
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from time import perf_counter, process_time, thread_time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 import fitz  # PyMuPDF
 import docx
-from sqlalchemy import select, insert
+from sqlalchemy import select
 
 from ..config import get_settings
-from ..db import database, documents, chunks, embeddings_index_map
-from ..vector_store.faiss_store import FaissStore
+from ..db import database, documents
 from .embedding_client import EmbeddingClient
-from .chunking import chunk_text, count_tokens
+from .index_writer import index_writer
+from .chunking import PendingPages, chunk_pages, chunk_pages_stream, count_tokens
 
 
 settings = get_settings()
 embedding_client = EmbeddingClient()
 
+ProgressCallback = Callable[..., Awaitable[None]]
+_EMBED_PROGRESS_STEP = 256
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
 
 def _hash_file(path: Path) -> str:
     h = hashlib.sha256()
@@ -24,12 +34,16 @@ def _hash_file(path: Path) -> str:
     return h.hexdigest()
 
 
-def _extract_pdf(path: Path) -> List[tuple[int, str]]:
-    doc = fitz.open(path)
-    pages = []
-    for page in doc:
-        pages.append((page.number + 1, page.get_text("text")))
-    return pages
+def _extract_pdf(path: Path, start: int = 0, stop: Optional[int] = None) -> List[tuple[int, str]]:
+    """Text of pages [start, stop) as (1-based page number, text)."""
+    with fitz.open(path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        return [(number + 1, doc.load_page(number).get_text("text")) for number in range(start, stop)]
+
+
+def _pdf_page_count(path: Path) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
 
 
 def _extract_docx(path: Path) -> List[tuple[Optional[int], str]]:
@@ -38,71 +52,219 @@ def _extract_docx(path: Path) -> List[tuple[Optional[int], str]]:
     return [(None, "\n".join(paragraphs))]
 
 
+async def find_duplicate(file_hash: str) -> Optional[int]:
+    existing = await database.fetch_one(select(documents.c.id).where(documents.c.file_hash == file_hash))
+    return existing[0] if existing else None
+
+
+async def _no_progress(**_) -> None:
+    return None
+
+
+def _chunk_pages(page_texts: List[tuple[Optional[int], str]]) -> List[dict]:
+    return chunk_pages(page_texts, settings.chunk_size, settings.chunk_overlap, settings.chunk_respect_boundaries)
+
+
+def stored_name_for(file_hash: str, filename: str) -> str:
+    """Name of the original under upload_dir: unique per content, so equal filenames never collide."""
+    return f"{file_hash[:16]}_{Path(filename).name}"
+
+
+async def discard_original(document) -> None:
+    """Unlink the stored original of the deleted `documents` row unless a document still uses it."""
+    if document["stored_name"]:
+        # Named by content hash, so only a re-upload of the same file can own it now.
+        key = documents.c.stored_name == document["stored_name"]
+        stored_name = document["stored_name"]
+    else:
+        # Ingested before stored names: the file is shared by legacy documents with this filename.
+        key = (documents.c.filename == document["filename"]) & documents.c.stored_name.is_(None)
+        stored_name = document["filename"]
+    if await database.fetch_one(select(documents.c.id).where(key)) is None:
+        (Path(settings.upload_dir) / stored_name).unlink(missing_ok=True)
+
+
+async def _adopt_original(document_id: int, file_path: Path) -> None:
+    """Move `file_path` to the stored name of `document_id` if that file is missing: a job
+    stopped between its commit and the move finds its own document when it is resumed."""
+    row = await database.fetch_one(select(documents.c.stored_name).where(documents.c.id == document_id))
+    if row is None or not row["stored_name"]:
+        return
+    target = Path(settings.upload_dir) / row["stored_name"]
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.move, file_path, target)
+
+
+def doc_type_for(path: Path) -> str:
+    return "pdf" if path.suffix.lower() == ".pdf" else "docx"
+
+
+def parse_file(path: Path) -> List[dict]:
+    """Extract and chunk a file into chunk rows (text, page_start, page_end, token_count).
+
+    Safe to run in a process pool.
+    """
+    extract = _extract_pdf if doc_type_for(path) == "pdf" else _extract_docx
+    return _chunk_pages(extract(path))
+
+
+def _extract_range(path: Path, start: int, stop: int) -> Tuple[List[tuple[Optional[int], str]], float]:
+    """Process-pool task: extract pages [start, stop) of a PDF (or a whole DOCX).
+
+    Returns (page texts, extract CPU seconds).
+    """
+    t0 = process_time()
+    page_texts = _extract_pdf(path, start, stop) if doc_type_for(path) == "pdf" else _extract_docx(path)
+    return page_texts, process_time() - t0
+
+
+def _chunk_step(
+    pending: Optional[PendingPages], page_texts: List[tuple[Optional[int], str]], final: bool
+) -> Tuple[List[dict], Optional[PendingPages], float]:
+    """Chunk the next pages of a document in order; returns (rows, pending, chunk CPU seconds)."""
+    t0 = thread_time()
+    rows, pending = chunk_pages_stream(
+        pending, page_texts, final, settings.chunk_size, settings.chunk_overlap, settings.chunk_respect_boundaries
+    )
+    return rows, pending, thread_time() - t0
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(settings.parse_workers)
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+
+async def iter_parsed(path: Path, timings: dict) -> AsyncIterator[Tuple[int, List[dict]]]:
+    """Yield (pages parsed, chunk rows) per page range, in page order.
+
+    Ranges are extracted in parallel by the process pool; their pages are then chunked in
+    order by one streaming chunker (in a thread), so chunks span range boundaries exactly as
+    `parse_file` chunks the whole document. At most two ranges per worker are in flight, which
+    bounds the extraction work queued in the pool and lets the caller embed early ranges while
+    later ones parse. It does not bound the document as a whole: the caller accumulates every
+    chunk row. CPU seconds spent extracting and chunking are accumulated into `timings`.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_parse_pool()
+    if doc_type_for(path) == "pdf":
+        n_pages = await asyncio.to_thread(_pdf_page_count, path)
+        step = settings.parse_pages_per_task
+        ranges = deque((start, start + step) for start in range(0, n_pages, step))
+    else:
+        ranges = deque([(0, 1)])
+    in_flight: deque = deque()
+    pending: Optional[PendingPages] = None
+    while ranges or in_flight:
+        while ranges and len(in_flight) < 2 * settings.parse_workers:
+            start, stop = ranges.popleft()
+            in_flight.append(loop.run_in_executor(pool, _extract_range, path, start, stop))
+        page_texts, extract_s = await in_flight.popleft()
+        final = not ranges and not in_flight
+        rows, pending, chunk_s = await asyncio.to_thread(_chunk_step, pending, page_texts, final)
+        timings["extract_cpu_s"] = timings.get("extract_cpu_s", 0.0) + extract_s
+        timings["chunk_cpu_s"] = timings.get("chunk_cpu_s", 0.0) + chunk_s
+        yield len(page_texts), rows
+
+
 async def ingest_file(
     file_path: Path,
     filename: str,
     source_unit: Optional[str],
     year: Optional[int],
     tags: Optional[dict],
-    faiss_index_path: str,
+    progress: Optional[ProgressCallback] = None,
+    file_hash: Optional[str] = None,
+    replaces: Optional[int] = None,
 ) -> int:
-    file_hash = _hash_file(file_path)
-    # Duplicate check
-    existing = await database.fetch_one(select(documents.c.id).where(documents.c.file_hash == file_hash))
+    """Ingest one file without blocking the event loop.
+
+    Hashing, the file move and chunking run in threads; extraction runs in a process pool by
+    page range (see `iter_parsed`) while already chunked text is being embedded.
+    `file_path` is read in place and only moved (not copied) into the upload dir once the
+    document is committed, so an interrupted or failed ingest leaves it where the caller put
+    it (a resumed job finds it again) and nothing in the upload dir. Pass `file_hash` when the caller
+    already computed it while receiving the file. `progress` is awaited with keyword counters
+    (pages_parsed, chunks_total, chunks_embedded) as work completes, and with `timings`
+    (seconds per stage) at the end. Nothing is written to SQLite until the index writer
+    commits the document, its chunks and vectors together, so peak memory is the whole
+    document's chunk text (about its extracted text plus overlap) and its embeddings as Python
+    float lists (chunks x dim x ~32 bytes: ~15 MB for 600 chunks of 768-d), plus the pages of
+    the ranges in flight in the parse pool. With `replaces`, that document is
+    deleted in the same commit.
+    """
+    progress = progress or _no_progress
+    file_hash = file_hash or await asyncio.to_thread(_hash_file, file_path)
+    existing = await find_duplicate(file_hash)
+    if existing and replaces is not None and existing != replaces:
+        raise ValueError(f"File is identical to document {existing}; document {replaces} was not replaced.")
     if existing:
-        return existing[0]
+        await _adopt_original(existing, file_path)
+        return existing
 
-    suffix = file_path.suffix.lower()
-    doc_type = "pdf" if suffix == ".pdf" else "docx"
+    doc_type = doc_type_for(file_path)
 
-    upload_dir = Path(settings.upload_dir)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    stored_path = upload_dir / filename
-    stored_path.write_bytes(file_path.read_bytes())
-
-    # Insert document
-    doc_id = await database.execute(
-        documents.insert().values(
-            filename=filename,
-            file_hash=file_hash,
-            type=doc_type,
-            source_unit=source_unit,
-            year=year,
-            tags=tags,
-        )
-    )
+    started = perf_counter()
+    timings: dict = {}
 
-    # Extract pages
-    if doc_type == "pdf":
-        page_texts = _extract_pdf(stored_path)
-    else:
-        page_texts = _extract_docx(stored_path)
-
-    all_chunks = []
-    global_idx = 0
-    for page_num, text in page_texts:
-        for _, (chunk, token_count) in enumerate(chunk_text(text, settings.chunk_size, settings.chunk_overlap)):
-            chunk_id = await database.execute(
-                insert(chunks).values(
-                    document_id=doc_id,
-                    chunk_index=global_idx,
-                    text=chunk,
-                    page_start=page_num,
-                    page_end=page_num,
-                    token_count=token_count,
-                )
-            )
-            all_chunks.append((chunk_id, chunk))
-            global_idx += 1
-
-    if all_chunks:
-        embeddings = embedding_client.embed([c[1] for c in all_chunks])
-        dim = len(embeddings[0])
-        faiss_store = FaissStore(faiss_index_path, dim=dim)
-        faiss_ids = faiss_store.add(embeddings)
-        await database.execute_many(
-            query=embeddings_index_map.insert(),
-            values=[{"chunk_id": cid, "faiss_vector_id": vid} for (cid, _), vid in zip(all_chunks, faiss_ids)],
-        )
+    chunk_rows: List[dict] = []
+    embeddings: List[List[float]] = []
+    pages_parsed = 0
+    embed_s = 0.0
+
+    async def embed_pending(final: bool) -> None:
+        nonlocal embed_s
+        while len(chunk_rows) - len(embeddings) >= (1 if final else _EMBED_PROGRESS_STEP):
+            batch = [row["text"] for row in chunk_rows[len(embeddings) : len(embeddings) + _EMBED_PROGRESS_STEP]]
+            t0 = perf_counter()
+            embeddings.extend(await embedding_client.aembed(batch, strict=True))
+            embed_s += perf_counter() - t0
+            await progress(chunks_embedded=len(embeddings))
+
+    parse_started = perf_counter()
+    async for pages, rows in iter_parsed(file_path, timings):
+        pages_parsed += pages
+        chunk_rows.extend(rows)
+        await progress(pages_parsed=pages_parsed, chunks_total=len(chunk_rows))
+        await embed_pending(final=False)
+    timings["parse_wall_s"] = perf_counter() - parse_started
+    await embed_pending(final=True)
+    timings["embed_s"] = embed_s
 
+    stored_name = stored_name_for(file_hash, filename)
+    document = {
+        "filename": filename,
+        "file_hash": file_hash,
+        "stored_name": stored_name,
+        "type": doc_type,
+        "source_unit": source_unit,
+        "year": year,
+        "tags": tags,
+    }
+    replaced = None
+    if replaces is not None:
+        replaced = await database.fetch_one(select(documents).where(documents.c.id == replaces))
+    commit_started = perf_counter()
+    doc_id = await index_writer.submit(document, chunk_rows, embeddings, replaces=replaces)
+    timings["commit_s"] = perf_counter() - commit_started
+    # A concurrent duplicate makes the writer return that document and keep `replaces`.
+    if replaced is not None and await find_duplicate(replaced["file_hash"]) is None:
+        await discard_original(replaced)
+
+    move_started = perf_counter()
+    upload_dir = Path(settings.upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(shutil.move, file_path, upload_dir / stored_name)
+    timings["move_s"] = perf_counter() - move_started
+    timings["total_s"] = perf_counter() - started
+    await progress(timings={k: round(v, 3) for k, v in timings.items()})
     return doc_id
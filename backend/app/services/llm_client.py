@@ -1,74 +1,181 @@
+import json
 import logging
-from typing import List, Dict
-import httpx
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..config import get_settings
+from .gemini import configure_gemini
+from .http_pool import get_http_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+_REMOTE_PROVIDERS = {"gemini", "google", "openai", "groq", "openrouter"}
+_OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def _gemini_contents(messages: List[Dict[str, str]]) -> List[dict]:
+    return [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in messages]
+
+
+def _fallback_answer(messages: List[Dict[str, str]]) -> str:
+    joined = "\n\n".join([f"- {m['content']}" for m in messages if m["role"] == "user"])
+    return f"(Fallback) Berdasarkan konteks tersedia, berikut ringkasan:\n{joined}"
+
+
+class LLMStreamError(RuntimeError):
+    """The provider failed after part of a streamed answer was already sent."""
+
+
+@dataclass
+class LLMReply:
+    text: str
+    complete: bool  # False for the heuristic fallback used when no provider answered
+
+
+class AnswerStream:
+    """Answer deltas from `LLMClient.astream_chat`.
+
+    Iterate it for the text. Once exhausted, `complete` is True only if a provider generated the
+    whole answer, so callers know whether it is worth keeping.
+    """
+
+    def __init__(self, produce: Callable[["AnswerStream"], AsyncIterator[str]]):
+        self.complete = False
+        self._deltas = produce(self)  # the producer sets `complete` on the stream it is given
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas.__aiter__()
+
+
 class LLMClient:
+    """Async chat client. Provider SDK clients are created once and share the pooled HTTP client."""
+
     def __init__(self):
         self.provider = settings.llm_provider.lower()
         self.api_key = settings.llm_api_key
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=4))
-    def chat(self, system_prompt: str, messages: List[Dict[str, str]]) -> str:
+        self._sdk_client: Any = None
+        self._gemini_models: Dict[str, Any] = {}
         if self.provider in {"gemini", "google"} and self.api_key:
-            try:
-                import google.generativeai as genai
+            configure_gemini(self.api_key)
 
-                genai.configure(api_key=self.api_key)
-                model = genai.GenerativeModel("models/gemini-1.5-flash")
-                full_prompt = [{"role": "system", "content": system_prompt}] + messages
-                resp = model.generate_content(full_prompt, request_options={"timeout": 60})
-                return resp.text
-            except Exception as exc:  # pragma: no cover
-                logger.warning("Gemini failed, falling back. %s", exc)
+    def _client(self):
+        if self._sdk_client is None:
+            if self.provider == "openai":
+                from openai import AsyncOpenAI
 
-        if self.provider == "openai" and self.api_key:
-            try:
-                from openai import OpenAI
-
-                client = OpenAI(api_key=self.api_key)
-                resp = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "system", "content": system_prompt}, *messages],
-                )
-                return resp.choices[0].message.content
-            except Exception as exc:  # pragma: no cover
-                logger.warning("OpenAI failed, falling back. %s", exc)
-
-        if self.provider == "groq" and self.api_key:
-            try:
+                self._sdk_client = AsyncOpenAI(api_key=self.api_key, http_client=get_http_client())
+            elif self.provider == "groq":
                 import groq
 
-                client = groq.Groq(api_key=self.api_key)
-                resp = client.chat.completions.create(
-                    model="llama-3.1-70b-versatile",
-                    messages=[{"role": "system", "content": system_prompt}, *messages],
-                )
-                return resp.choices[0].message.content
-            except Exception as exc:  # pragma: no cover
-                logger.warning("Groq failed, falling back. %s", exc)
-
-        if self.provider == "openrouter" and self.api_key:
-            headers = {"Authorization": f"Bearer {self.api_key}", "HTTP-Referer": "local-prototype"}
-            payload = {
-                "model": "openrouter/auto",
-                "messages": [{"role": "system", "content": system_prompt}, *messages],
-            }
+                self._sdk_client = groq.AsyncGroq(api_key=self.api_key, http_client=get_http_client())
+        return self._sdk_client
+
+    def _gemini_model(self, system_prompt: str):
+        model = self._gemini_models.get(system_prompt)
+        if model is None:
+            import google.generativeai as genai
+
+            model = genai.GenerativeModel("models/gemini-1.5-flash", system_instruction=system_prompt)
+            self._gemini_models[system_prompt] = model
+        return model
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=4))
+    async def _achat_remote(self, system_prompt: str, messages: List[Dict[str, str]]) -> str:
+        if self.provider in {"gemini", "google"}:
+            resp = await self._gemini_model(system_prompt).generate_content_async(
+                _gemini_contents(messages), request_options={"timeout": 60}
+            )
+            return resp.text
+
+        if self.provider in {"openai", "groq"}:
+            model = "gpt-4o-mini" if self.provider == "openai" else "llama-3.1-70b-versatile"
+            resp = await self._client().chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": system_prompt}, *messages],
+            )
+            return resp.choices[0].message.content
+
+        headers = {"Authorization": f"Bearer {self.api_key}", "HTTP-Referer": "local-prototype"}
+        payload = {
+            "model": "openrouter/auto",
+            "messages": [{"role": "system", "content": system_prompt}, *messages],
+        }
+        r = await get_http_client().post(_OPENROUTER_URL, json=payload, headers=headers)
+        r.raise_for_status()
+        data = r.json()
+        return data["choices"][0]["message"]["content"]
+
+    async def achat(self, system_prompt: str, messages: List[Dict[str, str]]) -> LLMReply:
+        if self.api_key and self.provider in _REMOTE_PROVIDERS:
             try:
-                r = httpx.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers, timeout=60)
-                r.raise_for_status()
-                data = r.json()
-                return data["choices"][0]["message"]["content"]
+                return LLMReply(await self._achat_remote(system_prompt, messages), complete=True)
             except Exception as exc:  # pragma: no cover
-                logger.warning("OpenRouter failed, falling back. %s", exc)
+                logger.warning("%s failed, falling back. %s", self.provider, exc)
 
         # Fallback: simple heuristic
-        joined = "\n\n".join([f"- {m['content']}" for m in messages if m["role"] == "user"])
-        return f"(Fallback) Berdasarkan konteks tersedia, berikut ringkasan:\n{joined}"
+        return LLMReply(_fallback_answer(messages), complete=False)
+
+    async def _astream_remote(self, system_prompt: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        if self.provider in {"gemini", "google"}:
+            resp = await self._gemini_model(system_prompt).generate_content_async(
+                _gemini_contents(messages), stream=True, request_options={"timeout": 60}
+            )
+            async for chunk in resp:
+                if chunk.text:
+                    yield chunk.text
+            return
+
+        full_messages = [{"role": "system", "content": system_prompt}, *messages]
+        if self.provider in {"openai", "groq"}:
+            model = "gpt-4o-mini" if self.provider == "openai" else "llama-3.1-70b-versatile"
+            stream = await self._client().chat.completions.create(model=model, messages=full_messages, stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            return
+
+        headers = {"Authorization": f"Bearer {self.api_key}", "HTTP-Referer": "local-prototype"}
+        payload = {"model": "openrouter/auto", "messages": full_messages, "stream": True}
+        async with get_http_client().stream("POST", _OPENROUTER_URL, json=payload, headers=headers) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: ") :]
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
 
+    def astream_chat(self, system_prompt: str, messages: List[Dict[str, str]]) -> AnswerStream:
+        """Stream the answer as text deltas.
+
+        A provider failure before the first delta falls back to `achat` (with its retries and
+        heuristic fallback), leaving the stream with `complete = False`. Once text has been sent,
+        a failure raises LLMStreamError from the iteration.
+        """
+        return AnswerStream(lambda stream: self._astream_deltas(system_prompt, messages, stream))
+
+    async def _astream_deltas(
+        self, system_prompt: str, messages: List[Dict[str, str]], stream: AnswerStream
+    ) -> AsyncIterator[str]:
+        emitted = False
+        if self.api_key and self.provider in _REMOTE_PROVIDERS:
+            try:
+                async for delta in self._astream_remote(system_prompt, messages):
+                    emitted = True
+                    yield delta
+                stream.complete = True
+                return
+            except Exception as exc:  # pragma: no cover
+                if emitted:
+                    logger.warning("%s stream interrupted. %s", self.provider, exc)
+                    raise LLMStreamError(f"{self.provider} stream interrupted") from exc
+                logger.warning("%s stream failed, falling back. %s", self.provider, exc)
+        reply = await self.achat(system_prompt, messages)
+        stream.complete = reply.complete
+        yield reply.text
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..db import database, chunks
+from ..schemas import ChunkMetadata
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def _chunk_texts(chunk_ids: List[int]) -> List[str]:
+    """Full text of each chunk (candidates only carry a short snippet), in the given order."""
+    rows = await database.fetch_all(select(chunks.c.id, chunks.c.text).where(chunks.c.id.in_(chunk_ids)))
+    text_of = {row["id"]: row["text"] for row in rows}
+    return [text_of.get(cid, "") for cid in chunk_ids]
+
+
+class Reranker:
+    """Local CPU cross-encoder that reorders retrieval candidates within a latency budget.
+
+    Candidates are scored on their full chunk text (the model truncates it to `max_length`
+    tokens) in batches in a worker thread. If the budget runs out before every
+    candidate is scored, or the model has not finished loading, the retrieval order is kept,
+    so reranking never adds more than roughly one batch beyond RERANK_BUDGET_MS to a request.
+    """
+
+    def __init__(self, model_name: str, batch_size: int, budget_ms: int):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._warming: Optional[asyncio.Task] = None
+
+    def _load(self) -> None:
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, max_length=512)
+
+    def start_loading(self) -> None:
+        """Load the model in the background (once)."""
+        if self._warming is None:
+            self._warming = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self) -> None:
+        try:
+            await asyncio.to_thread(self._load)
+            logger.info("Loaded reranker %s", self.model_name)
+        except Exception:  # pragma: no cover - reranking is optional
+            logger.exception("Loading reranker %s failed", self.model_name)
+
+    def _score(self, query: str, texts: List[str], deadline: float) -> Optional[List[float]]:
+        scores: List[float] = []
+        for start in range(0, len(texts), self.batch_size):
+            if start and time.monotonic() > deadline:
+                return None
+            pairs = [(query, text) for text in texts[start : start + self.batch_size]]
+            scores.extend(self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False).tolist())
+        return scores
+
+    async def rerank(self, query: str, candidates: List[ChunkMetadata], top_n: int) -> List[ChunkMetadata]:
+        """The `top_n` best candidates by cross-encoder score, or the first `top_n` on fallback."""
+        if len(candidates) <= 1:
+            return candidates[:top_n]
+        if self._model is None:
+            # Never block a request on loading the model; start it and serve retrieval order.
+            self.start_loading()
+            return candidates[:top_n]
+        deadline = time.monotonic() + self.budget_ms / 1000
+        texts = await _chunk_texts([c.chunk_id for c in candidates])
+        scores = await asyncio.to_thread(self._score, query, texts, deadline)
+        if scores is None:
+            logger.info(
+                "Rerank of %d candidates exceeded %d ms; keeping retrieval order", len(candidates), self.budget_ms
+            )
+            return candidates[:top_n]
+        order = sorted(range(len(candidates)), key=scores.__getitem__, reverse=True)
+        return [candidates[i] for i in order[:top_n]]
+
+
+reranker = Reranker(settings.rerank_model, settings.rerank_batch_size, settings.rerank_budget_ms)
@@ -1,40 +1,208 @@
-from typing import List
-from sqlalchemy import select
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import column, func, select, table, text
 
 from ..config import get_settings
-from ..db import database, chunks, documents, embeddings_index_map
-from ..vector_store.faiss_store import FaissStore
+from ..db import database, chunks, documents
+from ..vector_store.index_manager import index_manager
 from .embedding_client import EmbeddingClient
-from ..schemas import ChunkMetadata
+from .index_writer import index_writer
+from ..schemas import ChunkMetadata, RetrievalFilter
 
 settings = get_settings()
 embedding_client = EmbeddingClient()
 
+chunks_fts = table("chunks_fts", column("rowid"))
 
-async def retrieve(query: str, k: int = None) -> List[ChunkMetadata]:
-    k = k or settings.max_retrieve
-    query_emb = embedding_client.embed([query])[0]
-    store = FaissStore(settings.faiss_index_path, dim=384)
-    faiss_ids, _ = store.search(query_emb, k)
-    if not faiss_ids:
-        return []
+_SELECTOR_CACHE_SIZE = 128
+_selector_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
 
-    rows = []
-    for fid in faiss_ids:
-        mapping = await database.fetch_one(
-            select(embeddings_index_map.c.chunk_id).where(embeddings_index_map.c.faiss_vector_id == fid)
+
+async def _hydrate_many(id_lists: List[List[int]]) -> List[List[ChunkMetadata]]:
+    """Resolve the chunk ids of several rankings with one joined query, keeping rank order."""
+    wanted = {cid for ids in id_lists for cid in ids}
+    if not wanted:
+        return [[] for _ in id_lists]
+    query = (
+        select(
+            chunks.c.id.label("chunk_id"),
+            chunks.c.page_start,
+            chunks.c.text,
+            documents.c.id.label("document_id"),
+            documents.c.filename,
         )
-        if not mapping:
-            continue
-        chunk_row = await database.fetch_one(select(chunks).where(chunks.c.id == mapping[0]))
-        doc_row = await database.fetch_one(select(documents).where(documents.c.id == chunk_row["document_id"]))
-        rows.append(
-            ChunkMetadata(
-                document_id=doc_row["id"],
-                filename=doc_row["filename"],
-                page=chunk_row["page_start"],
-                chunk_id=chunk_row["id"],
-                snippet=chunk_row["text"][:400],
-            )
+        .select_from(chunks.join(documents, documents.c.id == chunks.c.document_id))
+        .where(chunks.c.id.in_(wanted))
+    )
+    by_id = {
+        row["chunk_id"]: ChunkMetadata(
+            document_id=row["document_id"],
+            filename=row["filename"],
+            page=row["page_start"],
+            chunk_id=row["chunk_id"],
+            snippet=row["text"][:400],
         )
-    return rows
+        for row in await database.fetch_all(query)
+    }
+    return [[by_id[cid] for cid in ids if cid in by_id] for ids in id_lists]
+
+
+async def embed_query(query: str) -> List[float]:
+    return (await embedding_client.aembed([query]))[0]
+
+
+# Word runs joined by identifier punctuation, e.g. "PER-01/2023" or "5.2.1".
+_TERM_RE = re.compile(r"\w+(?:[-/.:]\w+)*")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _fts_query(query: str) -> str:
+    """Free text to an FTS5 OR-query. Identifiers become phrases, so "PER-01/2023" must match
+    its tokens consecutively while ordinary words are ranked by BM25 independently."""
+    terms = {}
+    for term in _TERM_RE.findall(query.lower()):
+        terms.setdefault('"' + " ".join(_WORD_RE.findall(term)) + '"', None)
+    return " OR ".join(terms)
+
+
+def _filter_chunk_ids(filters: RetrievalFilter):
+    """SELECT of the chunk ids whose document matches `filters` (None when nothing is set)."""
+    conditions = []
+    if filters.source_unit is not None:
+        conditions.append(documents.c.source_unit == filters.source_unit)
+    if filters.year is not None:
+        conditions.append(documents.c.year == filters.year)
+    if filters.doc_type is not None:
+        conditions.append(documents.c.type == filters.doc_type)
+    for key, value in (filters.tags or {}).items():
+        path = '$."{}"'.format(str(key).replace('"', ""))
+        conditions.append(func.json_extract(documents.c.tags, path) == value)
+    if not conditions:
+        return None
+    return (
+        select(chunks.c.id)
+        .select_from(chunks.join(documents, documents.c.id == chunks.c.document_id))
+        .where(*conditions)
+    )
+
+
+async def _allowed_ids(filters: RetrievalFilter, stmt) -> np.ndarray:
+    """Materialized id selector for the vector search, cached per filter and writer commit so
+    repeated filtered queries skip the SQL; any committed ingest or delete starts a new key.
+    (Not the index version: it is published before the SQLite commit, so a query in between
+    would cache the old rows under the new version.)"""
+    key = (filters.model_dump_json(), index_writer.commits)
+    ids = _selector_cache.get(key)
+    if ids is None:
+        rows = await database.fetch_all(stmt)
+        ids = np.fromiter((row[0] for row in rows), dtype="int64", count=len(rows))
+        _selector_cache[key] = ids
+        while len(_selector_cache) > _SELECTOR_CACHE_SIZE:
+            _selector_cache.popitem(last=False)
+    else:
+        _selector_cache.move_to_end(key)
+    return ids
+
+
+async def lexical_search(query: str, k: int, chunk_filter=None) -> List[int]:
+    """Chunk ids ranked by BM25 over the chunks_fts index, optionally restricted to the ids
+    selected by `chunk_filter`."""
+    match = _fts_query(query)
+    if not match:
+        return []
+    stmt = (
+        select(chunks_fts.c.rowid)
+        .where(text("chunks_fts MATCH :match").bindparams(match=match))
+        .order_by(text("rank"))
+        .limit(k)
+    )
+    if chunk_filter is not None:
+        stmt = stmt.where(chunks_fts.c.rowid.in_(chunk_filter))
+    rows = await database.fetch_all(stmt)
+    return [row[0] for row in rows]
+
+
+def _rrf(rankings: Sequence[Tuple[List[int], float]], k: int) -> List[int]:
+    """Weighted reciprocal rank fusion of several ranked id lists."""
+    scores: Dict[int, float] = {}
+    for ids, weight in rankings:
+        for rank, chunk_id in enumerate(ids):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (settings.rrf_k + rank + 1)
+    return sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+
+
+async def retrieve_many(
+    queries: List[str],
+    k: int = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_embs: Optional[List[List[float]]] = None,
+    mode: Optional[str] = None,
+    lexical_weight: Optional[float] = None,
+    filters: Optional[RetrievalFilter] = None,
+) -> List[List[ChunkMetadata]]:
+    """Top-k chunks for each query, in query order.
+
+    All queries are embedded in one batched call, searched with a single multi-row FAISS search
+    and hydrated with one SQL query. `mode` is "vector" (FAISS only), "lexical" (FTS5/BM25
+    only) or "hybrid", which fuses both rankings with RRF; `lexical_weight` in [0, 1] sets the
+    lexical share of the fusion. `filters` restrict candidates to matching documents inside
+    both searches. Pass `query_embs` when the caller already embedded the queries.
+    """
+    if not queries:
+        return []
+    k = k or settings.max_retrieve
+    mode = mode or settings.retrieval_mode
+    weight = settings.hybrid_lexical_weight if lexical_weight is None else lexical_weight
+    if mode == "hybrid" and weight <= 0.0:
+        mode = "vector"
+    elif mode == "hybrid" and weight >= 1.0:
+        mode = "lexical"
+
+    chunk_filter = _filter_chunk_ids(filters) if filters else None
+    if mode == "lexical":
+        id_lists = [await lexical_search(query, k, chunk_filter) for query in queries]
+    else:
+        id_filter = await _allowed_ids(filters, chunk_filter) if chunk_filter is not None else None
+        if query_embs is None:
+            query_embs = await embedding_client.aembed(queries)
+        if index_manager.store is not None:
+            index_manager.store.check_compatible(embedding_client.model_id, len(query_embs[0]))
+        search = dict(nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)
+        if mode == "vector":
+            id_lists = [ids for ids, _ in index_manager.search_many(query_embs, k, **search)]
+        else:
+            depth = max(k, settings.hybrid_candidates)
+            vector_hits = index_manager.search_many(query_embs, depth, **search)
+            id_lists = []
+            for query, (vector_ids, _) in zip(queries, vector_hits):
+                lexical_ids = await lexical_search(query, depth, chunk_filter)
+                id_lists.append(_rrf([(vector_ids, 1.0 - weight), (lexical_ids, weight)], k))
+    return await _hydrate_many(id_lists)
+
+
+async def retrieve(
+    query: str,
+    k: int = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_emb: Optional[List[float]] = None,
+    mode: Optional[str] = None,
+    lexical_weight: Optional[float] = None,
+    filters: Optional[RetrievalFilter] = None,
+) -> List[ChunkMetadata]:
+    """Top-k chunks for `query`; see `retrieve_many`. Pass `query_emb` when the caller already
+    embedded it."""
+    results = await retrieve_many(
+        [query],
+        k,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        query_embs=[query_emb] if query_emb is not None else None,
+        mode=mode,
+        lexical_weight=lexical_weight,
+        filters=filters,
+    )
+    return results[0]
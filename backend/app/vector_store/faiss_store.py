@@ -1,42 +1,550 @@
+import json
+import logging
+import math
+import os
+import threading
+import uuid
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import numpy as np
 import faiss
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+_TRAINED_TYPES = {"ivf_flat", "ivf_pq"}
+_MAX_TRAIN = 200_000
+_ADD_BATCH = 65_536
+_MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def _factory_string(index_type: str, n_vectors: int) -> str:
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{settings.faiss_hnsw_m},Flat"
+    nlist = settings.faiss_nlist or max(1, int(4 * math.sqrt(n_vectors)))
+    if n_vectors < nlist:
+        raise ValueError(f"{index_type} needs at least nlist={nlist} vectors to train, got {n_vectors}")
+    if index_type == "ivf_flat":
+        return f"IDMap2,IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IDMap2,IVF{nlist},PQ{settings.faiss_pq_m}"
+    raise ValueError(f"Unknown FAISS index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str) -> faiss.Index:
+    """Create an IDMap2 index of the given type, train it if needed and add all vectors."""
+    index = faiss.index_factory(vectors.shape[1], _factory_string(index_type, len(vectors)))
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > _MAX_TRAIN:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), _MAX_TRAIN, replace=False)]
+        index.train(sample)
+    for start in range(0, len(vectors), _ADD_BATCH):
+        index.add_with_ids(vectors[start : start + _ADD_BATCH], ids[start : start + _ADD_BATCH])
+    return index
+
+
+def _inner_index(index: faiss.Index) -> faiss.Index:
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+
+
+def _fsync(path: Path) -> None:
+    with path.open("rb") as f:
+        os.fsync(f.fileno())
+
+
+def _read_index(path: Path, mmap: bool) -> faiss.Index:
+    if mmap:
+        try:
+            return faiss.read_index(str(path), _MMAP_FLAGS)
+        except RuntimeError:
+            logger.debug("mmap not supported for %s, reading into memory", path)
+    return faiss.read_index(str(path))
+
+
+class ManifestConflictError(RuntimeError):
+    """Another process committed the index since this snapshot was loaded."""
+
+
+class _IndexLock:
+    """Exclusive lock on an index directory, shared by every process writing to it.
+
+    Backed by flock (msvcrt.locking on Windows) on `<stem>.lock` and re-entrant within a
+    process, so a CLI can hold it around several store operations.
+    """
+
+    _registry: Dict[Path, "_IndexLock"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mutex = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @classmethod
+    def for_index(cls, index_path) -> "_IndexLock":
+        index_path = Path(index_path)
+        path = index_path.with_name(index_path.stem + ".lock").resolve()
+        with cls._registry_lock:
+            if path not in cls._registry:
+                cls._registry[path] = cls(path)
+            return cls._registry[path]
+
+    def __enter__(self) -> "_IndexLock":
+        self._mutex.acquire()
+        if self._depth == 0:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                    else:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            except BaseException:
+                self._mutex.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = None
+        self._mutex.release()
+
+
+def index_lock(index_path) -> _IndexLock:
+    """Cross-process writer lock for the index at `index_path` (use as a context manager)."""
+    return _IndexLock.for_index(index_path)
+
+
+class IndexMismatchError(RuntimeError):
+    """The index was built with a different embedding model or dimension than is configured, or
+    is a legacy positional index that is not keyed by chunk id."""
+
+
+class Segment:
+    """One immutable index file listed in the manifest. Never modified once written."""
+
+    __slots__ = ("name", "index", "inner")
+
+    def __init__(self, name: str, index: faiss.Index):
+        self.name = name
+        self.index = index
+        self.inner = _inner_index(index)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def ids(self) -> np.ndarray:
+        return faiss.vector_to_array(self.index.id_map).astype("int64")
+
+    def vectors(self) -> np.ndarray:
+        if isinstance(self.inner, faiss.IndexIVF):
+            self.inner.make_direct_map()
+        return self.inner.reconstruct_n(0, self.inner.ntotal)
+
 
 class FaissStore:
-    def __init__(self, index_path: str, dim: int):
+    """A snapshot of the on-disk index: an ordered list of immutable segments plus a manifest.
+
+    Writes add new segment files and then atomically replace the manifest, so a crash never
+    leaves a torn index and ingest cost no longer grows with the corpus. Deletes only record
+    tombstoned ids in the manifest, which searches exclude; IndexManager periodically folds
+    small segments together (plan_merge / build_merged) and physically drops tombstoned
+    vectors (plan_compaction / build_compacted).
+
+    The API and the CLIs may write the same index: commits hold `index_lock` and only succeed
+    while the manifest on disk is still the version this snapshot was loaded from and every
+    segment it lists exists; otherwise they raise ManifestConflictError and leave the index as
+    it was.
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        dim: int,
+        segments: Optional[List[Segment]] = None,
+        version: int = 0,
+        tombstones: frozenset = frozenset(),
+        model: Optional[str] = None,
+    ):
         self.index_path = Path(index_path)
         self.dim = dim
-        self.index = self._load_index()
+        self.segments: List[Segment] = segments or []
+        self.version = version
+        self.tombstones = tombstones
+        self.model = model  # embedding model id the vectors came from; None for legacy indexes
+        self._dropped: List[str] = []
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_path.with_name(self.index_path.stem + ".manifest.json")
+
+    @classmethod
+    def open(cls, index_path: str) -> Optional["FaissStore"]:
+        """Load the manifest and its segments, adopting a legacy single-file index if needed.
+
+        Returns None if nothing was written yet.
+        """
+        path = Path(index_path)
+        store = cls(index_path, dim=0)
+        # Locked so a concurrent commit cannot delete segments between manifest and segment reads.
+        with store.lock():
+            if store.manifest_path.exists():
+                manifest = json.loads(store.manifest_path.read_text())
+                store.dim = manifest["dim"]
+                store.version = manifest["version"]
+                store.segments = [
+                    Segment(name, _read_index(path.parent / name, mmap=True)) for name in manifest["segments"]
+                ]
+                store.tombstones = frozenset(manifest.get("tombstones", []))
+                store.model = manifest.get("model")
+                return store
+            if not path.exists():
+                return None
+            legacy = faiss.read_index(str(path))
+            store.dim = legacy.d
+            store.segments = [Segment(path.name, legacy)]
+            if store.has_ids:
+                store.commit()
+            return store
+
+    def lock(self) -> _IndexLock:
+        return index_lock(self.index_path)
+
+    def _disk_version(self) -> int:
+        if not self.manifest_path.exists():
+            return 0
+        return json.loads(self.manifest_path.read_text())["version"]
 
-    def _load_index(self) -> faiss.Index:
-        if self.index_path.exists():
-            return faiss.read_index(str(self.index_path))
+    @property
+    def ntotal(self) -> int:
+        """Stored vectors, including tombstoned ones not compacted away yet."""
+        return sum(s.ntotal for s in self.segments)
+
+    @property
+    def live_count(self) -> int:
+        return self.ntotal - len(self.tombstones)
+
+    def check_compatible(self, model: str, dim: int) -> None:
+        """Raise IndexMismatchError unless vectors from `model` (`dim`-d) belong in this index."""
+        if dim != self.dim or (self.model is not None and model != self.model):
+            raise IndexMismatchError(
+                f"FAISS index holds {self.dim}-d vectors from {self.model or 'an unrecorded model'}, "
+                f"but the configured embedding model is {model} ({dim}-d). "
+                "Run `python -m app.cli.reembed` to rebuild the index for the new model."
+            )
+
+    @property
+    def has_ids(self) -> bool:
+        """True when vectors are keyed by our own ids (IndexIDMap2) rather than by position."""
+        return all(hasattr(s.index, "id_map") for s in self.segments)
+
+    def _require_ids(self) -> None:
+        # Positional results would be hydrated as chunk ids and cite the wrong chunks.
+        if not self.has_ids:
+            raise IndexMismatchError(
+                f"{self.index_path} is a positional index; run `python -m app.cli.migrate_idmap` to convert it."
+            )
+
+    def clone(self) -> "FaissStore":
+        """Cheap copy for copy-on-write: segments are immutable, so only the list is copied."""
+        return FaissStore(
+            str(self.index_path),
+            dim=self.dim,
+            segments=list(self.segments),
+            version=self.version,
+            tombstones=self.tombstones,
+            model=self.model,
+        )
+
+    def _new_index(self) -> faiss.Index:
+        index_type = settings.faiss_index_type
+        if self.segments or index_type in _TRAINED_TYPES:
+            # Appends go to small flat segments; merges fold them into the (possibly trained) base.
+            index_type = "flat"
+        return faiss.index_factory(self.dim, _factory_string(index_type, 0))
+
+    def write_segment(self, index: faiss.Index) -> Segment:
+        """Persist an index as a new segment file (not yet referenced by the manifest)."""
         self.index_path.parent.mkdir(parents=True, exist_ok=True)
-        return faiss.IndexFlatL2(self.dim)
+        name = f"{self.index_path.stem}.{uuid.uuid4().hex[:16]}.seg"
+        path = self.index_path.parent / name
+        tmp_path = path.with_name(name + ".tmp")
+        faiss.write_index(index, str(tmp_path))
+        _fsync(tmp_path)
+        os.replace(tmp_path, path)
+        return Segment(name, index)
+
+    def commit(self) -> None:
+        """Atomically publish the current segment list as the new manifest version.
 
-    def save(self) -> None:
-        faiss.write_index(self.index, str(self.index_path))
+        Compare-and-swap on the manifest version under `index_lock`: raises ManifestConflictError
+        if another writer committed since this snapshot was loaded or a listed segment is gone.
+        """
+        with self.lock():
+            on_disk = self._disk_version()
+            if on_disk != self.version:
+                raise ManifestConflictError(
+                    f"{self.manifest_path} is at v{on_disk}, this snapshot was loaded at v{self.version}"
+                )
+            missing = [s.name for s in self.segments if not (self.index_path.parent / s.name).exists()]
+            if missing:
+                raise ManifestConflictError(f"segment files {missing} were removed by another writer")
+            manifest = {
+                "version": self.version + 1,
+                "dim": self.dim,
+                "model": self.model,
+                "segments": [s.name for s in self.segments],
+                "tombstones": sorted(self.tombstones),
+            }
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+            tmp_path.write_text(json.dumps(manifest, indent=2))
+            _fsync(tmp_path)
+            os.replace(tmp_path, self.manifest_path)
+            self.version += 1
 
-    def add(self, embeddings: List[List[float]]) -> List[int]:
+    def collect_garbage(self) -> None:
+        """Delete segment files dropped from the manifest by this store."""
+        for name in self._dropped:
+            try:
+                (self.index_path.parent / name).unlink(missing_ok=True)
+            except OSError as exc:  # e.g. still mapped on Windows; remove_orphans retries at next start
+                logger.warning("Could not delete old segment %s: %s", name, exc)
+        self._dropped = []
+
+    def remove_orphans(self) -> None:
+        """Delete segment and temp files left behind by crashes or failed deletions.
+
+        Segments another writer built but has not committed yet are deleted too; its commit then
+        fails with ManifestConflictError instead of publishing a missing file.
+        """
+        with self.lock():
+            live = {s.name for s in self.segments}
+            for path in self.index_path.parent.glob(f"{self.index_path.stem}.*"):
+                if path == self.manifest_path or path.name in live:
+                    continue
+                if path.suffix in {".seg", ".tmp"}:
+                    path.unlink(missing_ok=True)
+
+    def _commit_with(self, segment: Segment) -> None:
+        """Commit, deleting the freshly written `segment` if the commit is rejected."""
+        try:
+            self.commit()
+        except ManifestConflictError:
+            (self.index_path.parent / segment.name).unlink(missing_ok=True)
+            raise
+
+    def replace_segments(
+        self, old: Sequence[Segment], new: Optional[Segment], purged: Sequence[int] = ()
+    ) -> None:
+        """Swap `old` for `new` in one manifest commit; `purged` tombstones are physically gone."""
+        old_names = {s.name for s in old}
+        position = min(i for i, s in enumerate(self.segments) if s.name in old_names)
+        kept = [s for s in self.segments if s.name not in old_names]
+        if new is not None:
+            kept.insert(position, new)
+        self.segments = kept
+        self.tombstones = self.tombstones - set(purged)
+        if new is not None:
+            self._commit_with(new)
+        else:
+            self.commit()
+        self._dropped.extend(old_names)
+
+    def replace_all(self, index: faiss.Index, model: Optional[str] = None) -> None:
+        """Publish `index` as the only segment (one atomic manifest replace)."""
+        with self.lock():
+            old = list(self.segments)
+            segment = self.write_segment(index)
+            self.dim = index.d
+            self.model = model or self.model
+            self.segments = [segment]
+            self.tombstones = frozenset()
+            self._commit_with(segment)
+            self._dropped.extend(s.name for s in old)
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, vectors) for every live vector. Vectors are approximate for PQ indexes."""
+        self._require_ids()
+        if not self.segments:
+            return np.empty(0, dtype="int64"), np.empty((0, self.dim), dtype="float32")
+        ids = np.concatenate([s.ids() for s in self.segments])
+        vectors = np.vstack([s.vectors() for s in self.segments])
+        if self.tombstones:
+            live = ~np.isin(ids, self.tombstone_ids())
+            ids, vectors = ids[live], vectors[live]
+        return ids, vectors
+
+    def tombstone_ids(self) -> np.ndarray:
+        return np.fromiter(self.tombstones, dtype="int64", count=len(self.tombstones))
+
+    def add(self, embeddings: List[List[float]], ids: List[int]) -> List[int]:
+        self._require_ids()
         vecs = np.array(embeddings).astype("float32")
-        start_id = self.index.ntotal
-        self.index.add(vecs)
-        ids = list(range(start_id, start_id + vecs.shape[0]))
-        self.save()
-        return ids
-
-    def search(self, embedding: List[float], k: int) -> Tuple[List[int], List[float]]:
-        if self.index.ntotal == 0:
-            return [], []
-        vec = np.array([embedding]).astype("float32")
-        distances, indices = self.index.search(vec, k)
-        idxs = indices[0].tolist()
-        dists = distances[0].tolist()
-        filtered = [(i, d) for i, d in zip(idxs, dists) if i != -1]
-        if not filtered:
-            return [], []
-        ids, dist = zip(*filtered)
-        return list(ids), list(dist)
+        index = self._new_index()
+        index.add_with_ids(vecs, np.array(ids, dtype="int64"))
+        # Held from the first write to the commit so remove_orphans never sees our new segments.
+        with self.lock():
+            reused = self.tombstones.intersection(ids)
+            if reused:
+                # SQLite can hand out the rowid of a deleted chunk again; drop the dead vector first.
+                self.purge(np.fromiter(reused, dtype="int64", count=len(reused)))
+            segment = self.write_segment(index)
+            self.segments = self.segments + [segment]
+            self._commit_with(segment)
+        return list(ids)
+
+    def remove(self, ids: List[int]) -> int:
+        """Tombstone `ids`: searches stop returning them at once, compaction reclaims the space."""
+        self._require_ids()
+        new = set(ids) - self.tombstones
+        if new:
+            self.tombstones = self.tombstones | new
+            self.commit()
+        return len(new)
+
+    def purge(self, dead: np.ndarray) -> None:
+        """Physically remove the `dead` ids from every segment holding them, now."""
+        for segment in [s for s in self.segments if np.isin(s.ids(), dead).any()]:
+            new, purged = self.build_compacted(segment, dead)
+            self.replace_segments([segment], new, purged)
+
+    def plan_compaction(self) -> List[Segment]:
+        """Segments holding tombstoned vectors, once tombstones exceed FAISS_COMPACT_RATIO of
+        the stored vectors."""
+        if not self.tombstones or len(self.tombstones) < settings.faiss_compact_ratio * self.ntotal:
+            return []
+        dead = self.tombstone_ids()
+        return [s for s in self.segments if np.isin(s.ids(), dead).any()]
+
+    def build_compacted(self, segment: Segment, dead: np.ndarray) -> Tuple[Optional[Segment], List[int]]:
+        """Write a copy of `segment` without the `dead` ids; returns (segment or None if nothing
+        is left, ids purged)."""
+        ids = segment.ids()
+        doomed = np.isin(ids, dead)
+        purged = ids[doomed].tolist()
+        if doomed.all():
+            return None, purged
+        if isinstance(segment.inner, faiss.IndexHNSW):
+            # HNSW graphs do not support removal; rebuild from the surviving vectors.
+            index = build_index(segment.vectors()[~doomed], ids[~doomed], "hnsw")
+        else:
+            # Segments may be mmapped read-only; rewrite a private copy.
+            index = _read_index(self.index_path.parent / segment.name, mmap=False)
+            index.remove_ids(ids[doomed])
+        return self.write_segment(index), purged
+
+    def plan_merge(self) -> List[Segment]:
+        """Pick segments to fold together once there are more than FAISS_MAX_SEGMENTS.
+
+        The newest small segments are merged with each other; the base (first) segment is only
+        rewritten once they amount to FAISS_MERGE_RATIO of it, keeping merge cost amortized.
+        """
+        if len(self.segments) <= settings.faiss_max_segments:
+            return []
+        base, deltas = self.segments[0], self.segments[1:]
+        if sum(s.ntotal for s in deltas) >= settings.faiss_merge_ratio * base.ntotal:
+            return list(self.segments)
+        return deltas
+
+    def build_merged(self, segments: Sequence[Segment]) -> Segment:
+        """Write one segment holding all vectors of `segments`; the first one keeps its index type."""
+        base, rest = segments[0], segments[1:]
+        index = _read_index(self.index_path.parent / base.name, mmap=False)
+        for segment in rest:
+            index.add_with_ids(segment.vectors(), segment.ids())
+        return self.write_segment(index)
+
+    def _search_params(self, segment: Segment, nprobe: Optional[int], ef_search: Optional[int], sel=None):
+        extra = {"sel": sel} if sel is not None else {}
+        if isinstance(segment.inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(nprobe=nprobe or settings.faiss_nprobe, **extra)
+        if isinstance(segment.inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or settings.faiss_ef_search, **extra)
+        return faiss.SearchParameters(**extra) if extra else None
+
+    def search(
+        self,
+        embedding: List[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        id_filter: Optional[Sequence[int]] = None,
+    ) -> Tuple[List[int], List[float]]:
+        """k nearest ids across all segments. With `id_filter`, only those ids are candidates:
+        the selector is applied inside each segment's search, so k results come back from the
+        allowed set without over-fetching."""
+        return self.search_many([embedding], k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)[0]
 
+    def search_many(
+        self,
+        embeddings: Sequence[List[float]],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        id_filter: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[List[int], List[float]]]:
+        """`search` for a batch of queries: one multi-row search per segment on the stacked
+        matrix, then a per-row merge of the segment results."""
+        empty = [([], []) for _ in embeddings]
+        if self.ntotal == 0 or not embeddings:
+            return empty
+        self._require_ids()
+        sel = None
+        if id_filter is not None:
+            allowed = np.ascontiguousarray(id_filter, dtype="int64")
+            if self.tombstones:
+                allowed = np.setdiff1d(allowed, self.tombstone_ids())
+            if allowed.size == 0:
+                return empty
+            sel = faiss.IDSelectorBatch(allowed.size, faiss.swig_ptr(allowed))
+        elif self.tombstones:
+            dead = self.tombstone_ids()
+            dead_sel = faiss.IDSelectorBatch(dead.size, faiss.swig_ptr(dead))
+            sel = faiss.IDSelectorNot(dead_sel)
+        vecs = np.asarray(embeddings, dtype="float32").reshape(len(embeddings), -1)
+        all_dists, all_ids = [], []
+        for segment in self.segments:
+            if segment.ntotal == 0:
+                continue
+            params = self._search_params(segment, nprobe, ef_search, sel)
+            distances, indices = segment.index.search(vecs, k, params=params)
+            all_dists.append(distances)
+            all_ids.append(indices)
+        dists = np.concatenate(all_dists, axis=1)
+        idxs = np.concatenate(all_ids, axis=1)
+        dists[idxs == -1] = np.inf
+        order = np.argsort(dists, axis=1, kind="stable")[:, :k]
+        results = []
+        for row_dists, row_ids in zip(np.take_along_axis(dists, order, 1), np.take_along_axis(idxs, order, 1)):
+            keep = row_ids != -1
+            results.append((row_ids[keep].tolist(), row_dists[keep].tolist()))
+        return results
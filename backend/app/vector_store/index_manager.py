@@ -0,0 +1,213 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ..config import get_settings
+from .faiss_store import FaissStore, ManifestConflictError
+
+logger = logging.getLogger(__name__)
+
+
+class IndexManager:
+    """Process-wide owner of the resident FAISS index.
+
+    Readers grab the currently published store and search it without locking.
+    Writers are serialized, apply their changes to a private copy and then
+    publish it by swapping a single reference, so a search never waits on an
+    ingest and never observes a half-written index. Deletes publish tombstones
+    immediately. Segment merges and tombstone compaction run on a background
+    thread and only take the write lock to swap the result in.
+
+    Another process (a CLI rebuild) may publish a new manifest meanwhile. The
+    next write then fails its manifest compare-and-swap; the manager reloads the
+    index from disk and retries the write once on top of it.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._store: Optional[FaissStore] = None
+        self._version = 0
+        self._write_lock = threading.Lock()
+        self._maintaining = False
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def store(self) -> Optional[FaissStore]:
+        return self._store
+
+    def load(self) -> None:
+        """(Re)load the index from disk and publish it."""
+        with self._write_lock:
+            store = FaissStore.open(self.index_path)
+            if store:
+                store.remove_orphans()
+                if not store.has_ids:
+                    logger.error(
+                        "FAISS index %s stores row positions, not chunk ids; searches and writes are "
+                        "refused until it is converted with `python -m app.cli.migrate_idmap`.",
+                        self.index_path,
+                    )
+            self._publish(store)
+            if store:
+                logger.info(
+                    "Loaded FAISS index %s (%d vectors, %d deleted, in %d segments, dim=%d)",
+                    self.index_path,
+                    store.live_count,
+                    len(store.tombstones),
+                    len(store.segments),
+                    store.dim,
+                )
+        self._maybe_maintain()
+
+    def _publish(self, store: Optional[FaissStore]) -> None:
+        self._store = store
+        self._version += 1
+
+    def _reload_from_disk(self) -> None:
+        """Publish whatever another process committed; caller holds the write lock."""
+        store = FaissStore.open(self.index_path)
+        logger.warning(
+            "FAISS manifest %s was changed by another process; reloaded v%d",
+            self.index_path,
+            store.version if store else 0,
+        )
+        self._publish(store)
+
+    def _write(self, change: Callable[[Optional[FaissStore]], Tuple[Optional[FaissStore], object]]):
+        """Apply `change` to the current store under the write lock and publish the store it
+        returns (None = nothing to publish); retried once after reloading on a manifest conflict."""
+        with self._write_lock:
+            try:
+                store, result = change(self._store)
+            except ManifestConflictError:
+                self._reload_from_disk()
+                store, result = change(self._store)
+            if store is not None:
+                self._publish(store)
+        return store, result
+
+    def add(self, embeddings: List[List[float]], ids: List[int], model: Optional[str] = None) -> List[int]:
+        """Add vectors produced by embedding model `model`; a different model or dimension than
+        the index was built with raises IndexMismatchError."""
+
+        def change(current: Optional[FaissStore]):
+            if current is None:
+                store = FaissStore(self.index_path, dim=len(embeddings[0]), model=model)
+            else:
+                if model is not None:
+                    current.check_compatible(model, len(embeddings[0]))
+                store = current.clone()
+                store.model = store.model or model
+            return store, store.add(embeddings, ids)
+
+        store, added = self._write(change)
+        store.collect_garbage()
+        self._maybe_maintain()
+        return added
+
+    def remove(self, ids: List[int]) -> int:
+        """Tombstone `ids`; they disappear from searches as soon as this returns."""
+
+        def change(current: Optional[FaissStore]):
+            if current is None:
+                return None, 0
+            store = current.clone()
+            removed = store.remove(ids)
+            return (store if removed else None), removed
+
+        _, removed = self._write(change)
+        self._maybe_maintain()
+        return removed
+
+    def _maybe_maintain(self) -> None:
+        store = self._store
+        if self._maintaining or store is None or not (store.plan_compaction() or store.plan_merge()):
+            return
+        self._maintaining = True
+        threading.Thread(target=self._maintain, name="faiss-maintenance", daemon=True).start()
+
+    def _maintain(self) -> None:
+        try:
+            self._compact()
+            self._merge()
+        finally:
+            self._maintaining = False
+
+    def _swap_in(self, old, new, purged=()) -> bool:
+        """Replace `old` segments with `new` unless a concurrent swap already replaced one of them."""
+        with self._write_lock:
+            current = self._store
+            live = {s.name for s in current.segments} if current is not None else set()
+            if not all(s.name in live for s in old):
+                if new is not None:
+                    (Path(self.index_path).parent / new.name).unlink(missing_ok=True)
+                return False
+            store = current.clone()
+            try:
+                store.replace_segments(old, new, purged)
+            except ManifestConflictError:
+                self._reload_from_disk()
+                return False
+            self._publish(store)
+        store.collect_garbage()
+        return True
+
+    def _compact(self) -> None:
+        try:
+            store = self._store
+            plan = store.plan_compaction()
+            if not plan:
+                return
+            dead = store.tombstone_ids()
+            purged_total = 0
+            for segment in plan:
+                new, purged = store.build_compacted(segment, dead)
+                if self._swap_in([segment], new, purged):
+                    purged_total += len(purged)
+            logger.info("Compacted %d FAISS segments, dropping %d deleted vectors", len(plan), purged_total)
+        except Exception:  # pragma: no cover - compaction is best effort
+            logger.exception("FAISS compaction failed")
+
+    def _merge(self) -> None:
+        try:
+            plan = self._store.plan_merge()
+            if not plan:
+                return
+            merged = self._store.build_merged(plan)
+            if self._swap_in(plan, merged):
+                logger.info("Merged %d FAISS segments into %s", len(plan), merged.name)
+        except Exception:  # pragma: no cover - merge is best effort
+            logger.exception("FAISS segment merge failed")
+
+    def search(
+        self,
+        embedding: List[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        id_filter: Optional[Sequence[int]] = None,
+    ) -> Tuple[List[int], List[float]]:
+        store = self._store
+        if store is None:
+            return [], []
+        return store.search(embedding, k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)
+
+    def search_many(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        id_filter: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[List[int], List[float]]]:
+        store = self._store
+        if store is None:
+            return [([], []) for _ in embeddings]
+        return store.search_many(embeddings, k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)
+
+
+index_manager = IndexManager(get_settings().faiss_index_path)
@@ -0,0 +1,87 @@
+"""Deterministic synthetic audit-like text, documents and corpus chunks for the benchmarks.
+
+Only the stdlib is needed to generate text; PyMuPDF / python-docx are imported when files are
+written.
+"""
+import random
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+WORDS = (
+    "audit internal temuan risiko kontrol laporan keuangan persediaan pengadaan kontrak vendor "
+    "pembayaran rekonsiliasi anggaran realisasi kepatuhan prosedur dokumen bukti sampel selisih "
+    "rekomendasi tindak lanjut manajemen unit periode aset piutang utang kas bank jurnal"
+).split()
+SOURCE_UNITS = ("keuangan", "pengadaan", "operasional", "sdm", "ti")
+
+
+def sentence(rng: random.Random, min_words: int = 6, max_words: int = 24) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize() + "."
+
+
+def paragraph(rng: random.Random, max_sentences: int = 6) -> str:
+    return " ".join(sentence(rng) for _ in range(rng.randint(1, max_sentences)))
+
+
+def synthetic_pages(n_pages: int, seed: int, max_paragraphs: int = 12) -> List[Tuple[Optional[int], str]]:
+    """Pages of 0-`max_paragraphs` paragraphs; roughly a quarter are near-empty (cover pages,
+    tables, figures)."""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(1, n_pages + 1):
+        n_paragraphs = rng.choice([0, 1]) if rng.random() < 0.25 else rng.randint(2, max_paragraphs)
+        pages.append((number, "\n\n".join(paragraph(rng) for _ in range(n_paragraphs))))
+    return pages
+
+
+def write_pdf(path: Path, pages: Sequence[Tuple[Optional[int], str]]) -> None:
+    """One PDF page per entry; text that overflows the page box is dropped by PyMuPDF."""
+    import fitz
+
+    doc = fitz.open()
+    for _, text in pages:
+        page = doc.new_page()
+        if text:
+            page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def write_docx(path: Path, pages: Sequence[Tuple[Optional[int], str]]) -> None:
+    import docx
+    from docx.enum.text import WD_BREAK
+
+    document = docx.Document()
+    for _, text in pages:
+        for block in text.split("\n\n"):
+            if block:
+                document.add_paragraph(block)
+        document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    document.save(path)
+
+
+def write_documents(directory: Path, n_docs: int, n_pages: int, seed: int) -> List[Path]:
+    """Alternate PDF and DOCX files of `n_pages` synthetic pages each."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n_docs):
+        pages = synthetic_pages(n_pages, seed + i, max_paragraphs=6)
+        path = directory / f"synthetic-{seed + i:05d}.{'pdf' if i % 2 == 0 else 'docx'}"
+        (write_pdf if path.suffix == ".pdf" else write_docx)(path, pages)
+        paths.append(path)
+    return paths
+
+
+def chunk_texts(rng: random.Random, n: int, words: int) -> Iterator[str]:
+    """`n` chunk-sized passages of about `words` words."""
+    for _ in range(n):
+        parts, count = [], 0
+        while count < words:
+            parts.append(sentence(rng))
+            count += parts[-1].count(" ") + 1
+        yield " ".join(parts)
+
+
+def queries(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))) for _ in range(n)]
@@ -0,0 +1,87 @@
+"""Offline, deterministic stand-ins for EmbeddingClient and LLMClient.
+
+Import after the benchmark has pointed the settings at its scratch directory (see suite.py):
+the app modules patched here create their clients and stores at import time.
+"""
+import asyncio
+import hashlib
+from typing import AsyncIterator, Dict, List
+
+import numpy as np
+
+from app.services.embedding_client import configured_model_id
+from app.services.llm_client import AnswerStream, LLMReply
+
+
+class FakeEmbeddingClient:
+    """Unit vectors seeded by a hash of each text: the same text always gets the same vector.
+
+    Reports the model id the settings select, so the index manifest checks pass. An optional
+    per-call latency simulates a provider round trip.
+    """
+
+    def __init__(self, dim: int = 384, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.texts = 0
+
+    @property
+    def model_id(self) -> str:
+        return configured_model_id()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+    async def aembed(self, texts: List[str], strict: bool = False) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self.embed_array(texts).tolist()
+
+
+class FakeLLMClient:
+    """Echoes the first context header back as the answer after an optional delay."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def _answer(self, messages: List[Dict[str, str]]) -> str:
+        content = messages[-1]["content"]
+        header = next((line for line in content.splitlines() if line.startswith("(doc:")), "")
+        return f"Jawaban sintetis berdasarkan konteks {header}".strip()
+
+    async def achat(self, system_prompt: str, messages: List[Dict[str, str]]) -> LLMReply:
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return LLMReply(self._answer(messages), complete=True)
+
+    def astream_chat(self, system_prompt: str, messages: List[Dict[str, str]]) -> AnswerStream:
+        self.calls += 1
+        return AnswerStream(lambda stream: self._deltas(messages, stream))
+
+    async def _deltas(self, messages: List[Dict[str, str]], stream: AnswerStream) -> AsyncIterator[str]:
+        words = self._answer(messages).split(" ")
+        for word in words:
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000 / len(words))
+            yield word + " "
+        stream.complete = True
+
+
+def install(embedder: FakeEmbeddingClient, llm: FakeLLMClient) -> None:
+    """Swap the module-level clients of the ingest, retrieval, chat and agent services."""
+    from app.services import agent_service, chat_service, ingest_service, retrieval_service
+
+    ingest_service.embedding_client = embedder
+    retrieval_service.embedding_client = embedder
+    chat_service.llm_client = llm
+    agent_service.llm_client = llm
@@ -0,0 +1,345 @@
+"""Ingest and query benchmark with offline stand-ins for the embedding and LLM providers.
+
+    cd backend && python -m benchmarks.suite --scales 10000,100000
+    python -m benchmarks.suite --scales 10000,100000,1000000 --index-type ivf_flat --json out.json
+
+Everything runs against a scratch directory (SQLite, FAISS, uploads), never ../data:
+
+1. ingest: synthetic PDF/DOCX files go through `ingest_file` (process-pool parsing, fake
+   embeddings, index writer commit); reports docs/s, pages/s, chunks/s and the mean per-stage
+   timings that ingest jobs record.
+2. scale: the corpus is grown to each size in --scales by bulk-inserting generated chunks (FTS
+   triggers included) and rebuilding the FAISS index. At each size `retrieve` is timed per
+   --modes (p50/p95/p99), vector retrieval is split into FAISS search vs. SQL hydration, and
+   FTS5 search is timed separately. With --chat-queries, `handle_chat` is timed end to end with
+   the fake LLM. RSS and on-disk sizes are recorded at each size.
+
+Fake vectors are random unit vectors, so recall is meaningless and IVF/HNSW search costs are
+pessimistic compared to real, clustered embeddings; compare runs with each other, not with
+production numbers. 1M chunks at the default 384 dimensions needs ~4 GB of RAM for a flat index
+build (use --dim or --index-type ivf_pq to go lower).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+
+
+def _configure(workdir: Path, args: argparse.Namespace) -> None:
+    """Point the settings at `workdir` and switch off networked and cached paths.
+
+    Must run before anything under `app` is imported: settings are read at import time.
+    """
+    os.environ.update(
+        SQLITE_PATH=str(workdir / "sqlite" / "app.db"),
+        FAISS_INDEX_PATH=str(workdir / "faiss" / "index.bin"),
+        UPLOAD_DIR=str(workdir / "uploads"),
+        EMBED_CACHE_ENABLED="false",
+        EMBED_CACHE_PATH=str(workdir / "cache" / "embeddings.db"),
+        EMBED_API_KEY="",
+        LLM_API_KEY="",
+        ANSWER_CACHE_ENABLED="false",
+        RERANK_ENABLED="false",
+        FAISS_INDEX_TYPE=args.index_type,
+    )
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+def _memory() -> Dict[str, float]:
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    try:
+        with open("/proc/self/statm") as f:
+            rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        rss_mb = peak_mb
+    return {"rss_mb": round(rss_mb, 1), "peak_rss_mb": round(peak_mb, 1)}
+
+
+def _dir_mb(path: Path) -> float:
+    return round(sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 2**20, 1)
+
+
+class Corpus:
+    """Grows the scratch corpus directly through SQLite and rebuilds the FAISS index over it."""
+
+    def __init__(self, embedder, args: argparse.Namespace):
+        from app.db import get_engine
+        from app.vector_store.index_manager import index_manager
+
+        self.embedder = embedder
+        self.args = args
+        self.engine = get_engine()
+        self.rng = random.Random(args.seed)
+        store = index_manager.store
+        if store is not None and store.live_count:
+            ids, vectors = store.export()
+            self.ids, self.vectors = [ids], [vectors]
+        else:
+            self.ids, self.vectors = [], []
+
+    @property
+    def size(self) -> int:
+        return sum(len(ids) for ids in self.ids)
+
+    def grow(self, target: int) -> None:
+        from sqlalchemy import func, select
+
+        from app.db import chunks, documents, embeddings_index_map
+        from benchmarks.corpus import SOURCE_UNITS, chunk_texts
+
+        per_doc = self.args.chunks_per_doc
+        with self.engine.begin() as conn:
+            next_chunk = (conn.execute(select(func.max(chunks.c.id))).scalar() or 0) + 1
+            next_doc = (conn.execute(select(func.max(documents.c.id))).scalar() or 0) + 1
+        while self.size < target:
+            n = min(target - self.size, 100 * per_doc)
+            doc_rows, chunk_rows = [], []
+            texts = list(chunk_texts(self.rng, n, self.args.chunk_words))
+            for i, text in enumerate(texts):
+                if i % per_doc == 0:
+                    doc_rows.append(
+                        {
+                            "id": next_doc,
+                            "filename": f"corpus-{next_doc:07d}.pdf",
+                            "file_hash": f"corpus-{next_doc}",
+                            "type": "pdf",
+                            "source_unit": SOURCE_UNITS[next_doc % len(SOURCE_UNITS)],
+                            "year": 2019 + next_doc % 6,
+                        }
+                    )
+                    next_doc += 1
+                page = i % per_doc // 2 + 1
+                chunk_rows.append(
+                    {
+                        "id": next_chunk + i,
+                        "document_id": next_doc - 1,
+                        "chunk_index": i % per_doc,
+                        "text": text,
+                        "page_start": page,
+                        "page_end": page,
+                        "token_count": self.args.chunk_words,
+                    }
+                )
+            ids = np.arange(next_chunk, next_chunk + n, dtype="int64")
+            with self.engine.begin() as conn:
+                conn.execute(documents.insert(), doc_rows)
+                conn.execute(chunks.insert(), chunk_rows)
+                conn.execute(
+                    embeddings_index_map.insert(), [{"chunk_id": int(c), "faiss_vector_id": int(c)} for c in ids]
+                )
+            self.ids.append(ids)
+            self.vectors.append(self.embedder.embed_array(texts))
+            next_chunk += n
+
+    def rebuild_index(self) -> float:
+        """Build the configured index type over the whole corpus and publish it; returns seconds."""
+        from app.services.embedding_client import configured_model_id
+        from app.vector_store.faiss_store import FaissStore, build_index
+        from app.vector_store.index_manager import index_manager
+
+        started = perf_counter()
+        ids, vectors = np.concatenate(self.ids), np.concatenate(self.vectors)
+        self.ids, self.vectors = [ids], [vectors]
+        index = build_index(vectors, ids, self.args.index_type)
+        store = FaissStore.open(index_manager.index_path) or FaissStore(index_manager.index_path, dim=vectors.shape[1])
+        store.replace_all(index, model=configured_model_id())
+        store.collect_garbage()
+        index_manager.load()
+        return perf_counter() - started
+
+
+async def bench_ingest(args: argparse.Namespace, workdir: Path) -> dict:
+    from app.services.ingest_service import ingest_file
+    from benchmarks.corpus import write_documents
+
+    paths = write_documents(workdir / "source", args.ingest_docs, args.ingest_pages, args.seed)
+    stage_totals: Dict[str, float] = {}
+    counters = {"pages": 0, "chunks": 0}
+    semaphore = asyncio.Semaphore(args.ingest_concurrency)
+
+    async def one(path: Path) -> None:
+        async def progress(**fields) -> None:
+            if "timings" in fields:
+                for stage, seconds in fields["timings"].items():
+                    stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+            seen.update((key, fields[key]) for key in ("pages_parsed", "chunks_total") if key in fields)
+
+        seen = {"pages_parsed": 0, "chunks_total": 0}
+        async with semaphore:
+            await ingest_file(path, path.name, "benchmark", 2024, None, progress=progress)
+        counters["pages"] += seen["pages_parsed"]
+        counters["chunks"] += seen["chunks_total"]
+
+    started = perf_counter()
+    await asyncio.gather(*(one(path) for path in paths))
+    elapsed = perf_counter() - started
+    return {
+        "docs": len(paths),
+        "pages": counters["pages"],
+        "chunks": counters["chunks"],
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(paths) / elapsed, 2),
+        "pages_per_s": round(counters["pages"] / elapsed, 1),
+        "chunks_per_s": round(counters["chunks"] / elapsed, 1),
+        "mean_stage_s": {stage: round(total / len(paths), 4) for stage, total in stage_totals.items()},
+        **_memory(),
+    }
+
+
+async def bench_queries(args: argparse.Namespace, embedder) -> dict:
+    from app.schemas import ChatRequest
+    from app.services.chat_service import handle_chat
+    from app.services.retrieval_service import _hydrate_many, lexical_search, retrieve
+    from app.vector_store.index_manager import index_manager
+    from benchmarks.corpus import queries as make_queries
+
+    queries = make_queries(args.queries, args.seed)
+    for query in queries[: min(10, len(queries))]:  # warm caches and the SQLite page cache
+        await retrieve(query, args.k, mode="vector")
+
+    result: dict = {}
+    for mode in args.modes:
+        samples = []
+        for query in queries:
+            started = perf_counter()
+            await retrieve(query, args.k, mode=mode)
+            samples.append(perf_counter() - started)
+        result[f"retrieve_{mode}"] = _percentiles(samples)
+
+    faiss_s, hydrate_s, fts_s = [], [], []
+    embeddings = embedder.embed_array(queries)
+    for query, emb in zip(queries, embeddings):
+        started = perf_counter()
+        ((ids, _),) = index_manager.search_many([emb.tolist()], args.k)
+        faiss_s.append(perf_counter() - started)
+        started = perf_counter()
+        await _hydrate_many([ids])
+        hydrate_s.append(perf_counter() - started)
+        started = perf_counter()
+        await lexical_search(query, args.k)
+        fts_s.append(perf_counter() - started)
+    result["faiss_search"] = _percentiles(faiss_s)
+    result["sql_hydrate"] = _percentiles(hydrate_s)
+    result["fts_search"] = _percentiles(fts_s)
+
+    if args.chat_queries:
+        samples = []
+        for query in queries[: args.chat_queries]:
+            started = perf_counter()
+            await handle_chat(ChatRequest(user="benchmark", query=query, max_retrieve=args.k))
+            samples.append(perf_counter() - started)
+        result["chat"] = _percentiles(samples)
+    return result
+
+
+def _print_ingest(result: dict) -> None:
+    print(
+        f"ingest: {result['docs']} docs, {result['pages']} pages, {result['chunks']} chunks in {result['seconds']}s "
+        f"-> {result['docs_per_s']} docs/s, {result['pages_per_s']} pages/s, {result['chunks_per_s']} chunks/s"
+    )
+    stages = ", ".join(f"{stage} {seconds}" for stage, seconds in result["mean_stage_s"].items())
+    print(f"  mean per doc (s): {stages}")
+
+
+def _print_scale(result: dict) -> None:
+    print(
+        f"\n{result['chunks']} chunks: index build {result['index_build_s']}s, rss {result['rss_mb']} MB "
+        f"(peak {result['peak_rss_mb']} MB), sqlite {result['sqlite_mb']} MB, faiss {result['faiss_mb']} MB"
+    )
+    for name, stats in result.items():
+        if isinstance(stats, dict):
+            print(
+                f"  {name:<18} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                f"p99 {stats['p99_ms']:>9.3f} ms"
+            )
+
+
+async def _run(args: argparse.Namespace, workdir: Path) -> dict:
+    from app.db import database, init_db
+    from app.services.http_pool import close_http_client
+    from app.services.index_writer import index_writer
+    from app.services.ingest_service import shutdown_parse_pool
+    from app.vector_store.index_manager import index_manager
+    from benchmarks.fakes import FakeEmbeddingClient, FakeLLMClient, install
+
+    embedder = FakeEmbeddingClient(args.dim, args.embed_latency_ms)
+    install(embedder, FakeLLMClient(args.llm_latency_ms))
+    init_db()
+    await database.connect()
+    await asyncio.to_thread(index_manager.load)
+    await index_writer.start()
+    report: dict = {"config": {k: v for k, v in vars(args).items() if k != "json"}, "scales": []}
+    try:
+        if args.ingest_docs:
+            report["ingest"] = await bench_ingest(args, workdir)
+            _print_ingest(report["ingest"])
+        corpus = Corpus(embedder, args)
+        for target in args.scales:
+            started = perf_counter()
+            corpus.grow(target)
+            grow_s = perf_counter() - started
+            result = {"chunks": corpus.size, "generate_s": round(grow_s, 3)}
+            result["index_build_s"] = round(await asyncio.to_thread(corpus.rebuild_index), 3)
+            result.update(await bench_queries(args, embedder))
+            result.update(_memory())
+            result["sqlite_mb"] = _dir_mb(workdir / "sqlite")
+            result["faiss_mb"] = _dir_mb(workdir / "faiss")
+            report["scales"].append(result)
+            _print_scale(result)
+    finally:
+        shutdown_parse_pool()
+        await index_writer.stop()
+        await close_http_client()
+        await database.disconnect()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated corpus sizes in chunks")
+    parser.add_argument("--modes", default="vector,lexical,hybrid", help="retrieval modes to time")
+    parser.add_argument("--index-type", default="flat", choices=("flat", "ivf_flat", "ivf_pq", "hnsw"))
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chat-queries", type=int, default=50, help="0 skips the chat timing")
+    parser.add_argument("--ingest-docs", type=int, default=8, help="0 skips the ingest stage")
+    parser.add_argument("--ingest-pages", type=int, default=50)
+    parser.add_argument("--ingest-concurrency", type=int, default=2)
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--chunk-words", type=int, default=150)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="simulated provider round trip")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="scratch directory (default: a fresh temp dir, removed afterwards)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    args.scales = sorted(int(s) for s in args.scales.split(","))
+    args.modes = [m for m in args.modes.split(",") if m]
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    _configure(workdir, args)
+    try:
+        report = asyncio.run(_run(args, workdir))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read when `app` is first imported, so point them at a scratch directory first.
+_SCRATCH = Path(tempfile.mkdtemp(prefix="rag-tests-"))
+os.environ.update(
+    SQLITE_PATH=str(_SCRATCH / "sqlite" / "app.db"),
+    FAISS_INDEX_PATH=str(_SCRATCH / "faiss" / "index.bin"),
+    UPLOAD_DIR=str(_SCRATCH / "uploads"),
+    EMBED_CACHE_ENABLED="false",
+    EMBED_API_KEY="",
+    LLM_API_KEY="",
+    RERANK_ENABLED="false",
+)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services.chunking import chunk_pages, chunk_pages_stream, chunk_text, enc
+from benchmarks.corpus import synthetic_pages
+
+
+def _text(n_pages: int = 40, seed: int = 0) -> str:
+    return "\n\n".join(text for _, text in synthetic_pages(n_pages, seed) if text)
+
+
+def test_chunk_text_windows_follow_token_offsets():
+    text = _text()
+    tokens = enc.encode(text)
+    chunks = chunk_text(text, chunk_size=200, overlap=30)
+
+    stride = 200 - 30
+    assert len(chunks) == -(-(len(tokens) - 30) // stride)
+    for i, (chunk, count) in enumerate(chunks):
+        start = i * stride
+        assert count == len(tokens[start : start + 200])
+        assert chunk == enc.decode(tokens[start : start + count])
+    assert chunks[-1][0] == text[len(text) - len(chunks[-1][0]) :]  # ends exactly at the end
+
+
+def test_chunk_text_overlap_repeats_the_tail_of_the_previous_chunk():
+    chunks = chunk_text(_text(), chunk_size=200, overlap=30)
+    for (prev, _), (nxt, _) in zip(chunks, chunks[1:]):
+        tail = enc.decode(enc.encode(prev)[-30:])
+        assert nxt.startswith(tail)
+
+
+def test_respect_boundaries_ends_chunks_on_a_break():
+    chunks = chunk_text(_text(), chunk_size=200, overlap=30, respect_boundaries=True)
+    assert all(count <= 200 for _, count in chunks)
+    assert all(chunk.rstrip().endswith((".", "!", "?", ";", ":")) for chunk, _ in chunks[:-1])
+
+
+def test_chunk_pages_spans_pages_and_records_the_range():
+    pages = [(1, "Cover"), (2, ""), (3, _text(6, 1)), (4, _text(6, 2))]
+    rows = chunk_pages(pages, chunk_size=200, overlap=30)
+    assert rows[0]["page_start"] == 1
+    assert any(row["page_start"] != row["page_end"] for row in rows)
+    assert rows[-1]["page_end"] == 4
+    assert all(row["page_start"] != 2 for row in rows)  # empty pages are skipped
+
+
+@pytest.mark.parametrize("respect_boundaries", [False, True])
+@pytest.mark.parametrize("batch", [1, 3, 16])
+def test_streamed_chunks_equal_whole_document_chunks(batch, respect_boundaries):
+    pages = synthetic_pages(60, seed=batch)
+    expected = chunk_pages(pages, 200, 30, respect_boundaries)
+
+    rows, pending = [], None
+    for start in range(0, len(pages), batch):
+        final = start + batch >= len(pages)
+        out, pending = chunk_pages_stream(pending, pages[start : start + batch], final, 200, 30, respect_boundaries)
+        rows.extend(out)
+    assert rows == expected
@@ -0,0 +1,60 @@
+import asyncio
+import random
+from uuid import uuid4
+
+from app.db import chunks, database, documents, init_db
+from app.schemas import ChunkMetadata
+from app.services.chunking import count_tokens
+from app.services.context_builder import pack_context
+from benchmarks.corpus import chunk_texts
+
+
+async def _insert_chunks(texts):
+    """One document whose chunks are not consecutive, so every hit is its own block."""
+    doc_id = await database.execute(
+        documents.insert().values(filename="lhp.pdf", file_hash=uuid4().hex, type="pdf")
+    )
+    retrieved = []
+    for i, text in enumerate(texts):
+        chunk_id = await database.execute(
+            chunks.insert().values(
+                document_id=doc_id, chunk_index=2 * i, text=text, page_start=i + 1, page_end=i + 1, token_count=0
+            )
+        )
+        retrieved.append(ChunkMetadata(document_id=doc_id, filename="lhp.pdf", page=i + 1, chunk_id=chunk_id, snippet=""))
+    return retrieved
+
+
+def test_packed_context_never_exceeds_the_budget():
+    init_db()
+
+    async def run():
+        await database.connect()
+        try:
+            # Ending on a word, the blank line between blocks costs a token of its own.
+            retrieved = await _insert_chunks([t.rstrip(".") for t in chunk_texts(random.Random(0), 6, 120)])
+            for budget in range(150, 900, 7):
+                packed = await pack_context(retrieved, token_budget=budget)
+                assert packed.tokens_used == count_tokens(packed.text)
+                assert packed.tokens_used <= budget, budget
+                assert len(packed.blocks) >= 1
+        finally:
+            await database.disconnect()
+
+    asyncio.run(run())
+
+
+def test_blocks_are_kept_whole_when_they_fit():
+    init_db()
+
+    async def run():
+        await database.connect()
+        try:
+            retrieved = await _insert_chunks(list(chunk_texts(random.Random(1), 3, 60)))
+            packed = await pack_context(retrieved, token_budget=10_000)
+            assert [b.chunk_ids for b in packed.blocks] == [[c.chunk_id] for c in retrieved]
+            assert packed.text.count("\n\n(doc:lhp.pdf") == 2
+        finally:
+            await database.disconnect()
+
+    asyncio.run(run())
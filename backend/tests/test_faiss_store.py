@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.vector_store import faiss_store
+from app.vector_store.faiss_store import FaissStore, ManifestConflictError
+
+DIM = 8
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    vecs = np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _segment_files(store: FaissStore) -> set:
+    return {path.name for path in store.index_path.parent.glob("*.seg")}
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "index.bin")
+
+
+def test_search_skips_tombstoned_ids(index_path):
+    vecs = _vectors(5)
+    store = FaissStore(index_path, dim=DIM)
+    store.add(vecs.tolist(), [1, 2, 3, 4, 5])
+    store.remove([2])
+
+    ids, _ = store.search(vecs[1].tolist(), 5)
+    assert sorted(ids) == [1, 3, 4, 5]
+    [(filtered, _)] = store.search_many([vecs[1].tolist()], 5, id_filter=[1, 2])
+    assert filtered == [1]
+
+
+def test_reused_id_replaces_the_dead_vector(index_path):
+    vecs = _vectors(4)
+    store = FaissStore(index_path, dim=DIM)
+    store.add(vecs[:3].tolist(), [1, 2, 3])
+    store.remove([3])
+
+    store.add([vecs[3].tolist()], [3])  # SQLite handed out the deleted rowid again
+
+    assert 3 not in store.tombstones
+    assert store.ntotal == 3  # the old vector of id 3 was purged, not just hidden
+    ids, _ = store.search(vecs[3].tolist(), 1)
+    assert ids == [3]
+    ids, _ = store.search(vecs[2].tolist(), 3)
+    assert ids.count(3) == 1
+
+
+def test_concurrent_commit_is_rejected(index_path):
+    vecs = _vectors(3)
+    FaissStore(index_path, dim=DIM).add([vecs[0].tolist()], [1])
+    first, second = FaissStore.open(index_path), FaissStore.open(index_path)
+
+    first.add([vecs[1].tolist()], [2])
+    with pytest.raises(ManifestConflictError):
+        second.add([vecs[2].tolist()], [3])
+
+    reopened = FaissStore.open(index_path)
+    assert reopened.version == first.version
+    assert sorted(np.concatenate([s.ids() for s in reopened.segments]).tolist()) == [1, 2]
+    # The rejected writer deleted the segment it had written.
+    assert _segment_files(reopened) == {s.name for s in reopened.segments}
+
+
+def test_compaction_drops_tombstoned_vectors(index_path, monkeypatch):
+    monkeypatch.setattr(faiss_store.settings, "faiss_compact_ratio", 0.25)
+    vecs = _vectors(4)
+    store = FaissStore(index_path, dim=DIM)
+    store.add(vecs[:2].tolist(), [1, 2])
+    store.add(vecs[2:].tolist(), [3, 4])
+    store.remove([1, 2])
+
+    plan = store.plan_compaction()
+    assert len(plan) == 1
+    dead = store.tombstone_ids()
+    for segment in plan:
+        new, purged = store.build_compacted(segment, dead)
+        store.replace_segments([segment], new, purged)
+    store.collect_garbage()
+
+    assert store.tombstones == frozenset()
+    assert store.ntotal == 2
+    reopened = FaissStore.open(index_path)
+    assert sorted(reopened.search(vecs[0].tolist(), 4)[0]) == [3, 4]
+    assert _segment_files(reopened) == {s.name for s in reopened.segments}
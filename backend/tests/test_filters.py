@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_invalid_filters_are_rejected_with_422_everywhere():
+    with TestClient(app) as client:
+        resp = client.get("/api/retrieve", params={"query": "kas", "tags": "not json"})
+        assert resp.status_code == 422, resp.text
+
+        resp = client.post(
+            "/api/agent/run",
+            json={"mode": "summarize_audit_report", "user": "auditor", "payload": {"query": "kas", "filters": {"year": "x"}}},
+        )
+        assert resp.status_code == 422, resp.text
+
+        resp = client.post("/api/chat", json={"user": "auditor", "query": "kas", "filters": {"year": "x"}})
+        assert resp.status_code == 422, resp.text
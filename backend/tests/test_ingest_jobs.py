@@ -0,0 +1,47 @@
+import io
+import time
+
+import docx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import ingest_service
+from benchmarks.fakes import FakeEmbeddingClient
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx_bytes(text: str) -> bytes:
+    document = docx.Document()
+    document.add_paragraph(text)
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+
+def test_job_status_is_served_while_queued_and_after_finishing(monkeypatch):
+    monkeypatch.setattr(ingest_service, "embedding_client", FakeEmbeddingClient())
+    with TestClient(app) as client:
+        upload = {"file": ("temuan.docx", _docx_bytes("Temuan audit atas rekonsiliasi kas bank."), DOCX_TYPE)}
+        resp = client.post("/api/ingest", files=upload)
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+
+        deadline = time.monotonic() + 30
+        while True:
+            resp = client.get(f"/api/ingest/jobs/{job_id}")
+            assert resp.status_code == 200, resp.text
+            job = resp.json()
+            assert job["created_at"] and job["updated_at"]
+            if job["status"] in {"done", "failed"} or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+
+        assert job["status"] == "done", job["error"]
+        assert job["document_id"] is not None
+        assert job["pages_parsed"] == 1
+        assert job["chunks_total"] == job["chunks_embedded"] >= 1
+
+        documents = client.get("/api/documents")
+        assert documents.status_code == 200, documents.text
+        assert all(doc["uploaded_at"] for doc in documents.json())